@@ -0,0 +1,102 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import SynchronousOnlyOperation
+from django.http import Http404
+from rest_framework.response import Response
+
+
+async def run_sync(func, *args, **kwargs):
+    """Call func in the event loop, or in a worker thread if it queries
+    the database.
+
+    Only for code that may be run again from the start, such as
+    authentication or filtering. Django refuses queries from the event
+    loop before any is sent.
+    """
+    try:
+        return func(*args, **kwargs)
+    except SynchronousOnlyOperation:
+        return await sync_to_async(func)(*args, **kwargs)
+
+
+class AsyncReadMixin:
+    """Serve the async_actions of a viewset with async handlers.
+
+    With ASYNC_VIEWS enabled, GET requests routed to one of the actions
+    are handled by its "a"-prefixed coroutine, for example alist, which
+    reads the database with the async ORM. Authentication, permissions
+    and filtering only move to a worker thread when they query the
+    database. Other methods and actions are dispatched as usual.
+    """
+    async_actions = ('list', 'retrieve')
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_VIEWS or actions.get(
+                'get') not in cls.async_actions:
+            return view
+        sync_view = sync_to_async(view)
+
+        async def async_view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_view(request, *args, **kwargs)
+            self = cls(**initkwargs)
+            self.action_map = dict(actions, head=actions['get'])
+            return await self.adispatch(request, *args, **kwargs)
+
+        async_view.__dict__.update(view.__dict__)
+        return async_view
+
+    async def adispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await run_sync(self.initial, request, *args, **kwargs)
+            handler = getattr(self, f'a{self.action}')
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        return self.finalize_response(request, response, *args, **kwargs)
+
+    async def aprepare(self, request, objects):
+        """Load what the serializer needs beyond the objects."""
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self)
+
+    async def aget_object(self):
+        queryset = await run_sync(self.filter_queryset, self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.filter(**{
+                self.lookup_field: self.kwargs[lookup_url_kwarg]}).afirst()
+        except (TypeError, ValueError):
+            raise Http404
+        if obj is None:
+            raise Http404(f'No {queryset.model._meta.object_name} matches '
+                          'the given query.')
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await run_sync(self.filter_queryset, self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        objects = page if page is not None else [
+            obj async for obj in queryset]
+        await self.aprepare(request, objects)
+        serializer = self.get_serializer(objects, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        await self.aprepare(request, [instance])
+        return Response(self.get_serializer(instance).data)
@@ -0,0 +1,43 @@
+from collections import Counter
+
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from api.cache import get_generation
+
+CACHE_ALIAS = 'tokens'
+GENERATION = 'tokens'
+TOKEN_KEY = 'auth:token:{}:{}'
+
+token_cache_stats = Counter()
+
+
+def get_token_cache_report(stats=token_cache_stats):
+    hits = stats['hits']
+    total = hits + stats['misses']
+    return {
+        'hits': hits,
+        'misses': total - hits,
+        'hit_rate': round(hits / total, 4) if total else None, }
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication resolving tokens from a process-local cache.
+
+    A resolved token is kept for the timeout of the "tokens" cache, so
+    most requests skip the Token and User query. The key includes the
+    "tokens" generation, bumped on logout and user changes, so every
+    worker drops its cached tokens at once.
+    """
+
+    def authenticate_credentials(self, key):
+        cache = caches[CACHE_ALIAS]
+        cache_key = TOKEN_KEY.format(get_generation(GENERATION), key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            token_cache_stats['hits'] += 1
+            return cached
+        token_cache_stats['misses'] += 1
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, (user, token))
+        return user, token
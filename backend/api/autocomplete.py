@@ -0,0 +1,73 @@
+import heapq
+from bisect import bisect_left, bisect_right
+
+from api.cache import LazyIndex
+from cookbook.models import Ingredient
+
+
+def normalize(value):
+    """Case-insensitive form of a name with ё folded into е."""
+    return value.strip().lower().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """In-memory index of ingredient names sorted for prefix lookups."""
+
+    def __init__(self, ingredients):
+        entries = sorted(
+            (normalize(name), pk, name, measurement_unit)
+            for pk, name, measurement_unit in ingredients)
+        self.keys = [entry[0] for entry in entries]
+        self.text = '\n'.join(self.keys)
+        self.offsets = []
+        offset = 0
+        for key in self.keys:
+            self.offsets.append(offset)
+            offset += len(key) + 1
+        self.items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in entries]
+
+    def all(self):
+        return self.items
+
+    def search(self, query, limit):
+        """Return names starting with the query, then names containing it.
+
+        Prefix matches come in alphabetical order. Substring matches are
+        ranked by the position of the match and only scanned for when the
+        prefix matches do not fill the limit.
+        """
+        query = normalize(query).replace('\n', ' ')
+        start = bisect_left(self.keys, query)
+        stop = start
+        while (stop < len(self.keys) and stop - start < limit
+               and self.keys[stop].startswith(query)):
+            stop += 1
+        results = self.items[start:stop]
+        if len(results) == limit:
+            return results
+        results.extend(
+            self.items[position] for _, position in heapq.nsmallest(
+                limit - len(results), self.find_contains(query)))
+        return results
+
+    def find_contains(self, query):
+        """Yield (match offset, position) of keys containing the query.
+
+        All keys are searched at once in a newline-joined copy, so the
+        scan runs in str.find instead of a Python loop over the names.
+        """
+        found = self.text.find(query)
+        while found != -1:
+            position = bisect_right(self.offsets, found) - 1
+            offset = found - self.offsets[position]
+            if offset:
+                yield offset, position
+            if position + 1 == len(self.offsets):
+                return
+            found = self.text.find(query, self.offsets[position + 1])
+
+
+ingredient_index = LazyIndex('ingredients', lambda: IngredientIndex(
+    Ingredient.objects.values_list('id', 'name', 'measurement_unit')))
@@ -0,0 +1,112 @@
+from django.db import connection, transaction
+
+from api.relations import RELATIONS, get_user_relations
+from cookbook.carts import change_user_recipes
+from cookbook.counters import increment
+from cookbook.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow, User
+
+BATCH_LIMIT = 100
+# Postgres and SQLite both support ON CONFLICT and RETURNING. Only the
+# rows really inserted or deleted are returned, so concurrent requests
+# never count the same link twice.
+INSERT = """
+    INSERT INTO {table} ({user}, {target})
+    SELECT %s, id FROM {targets} WHERE id IN ({ids})
+    ON CONFLICT DO NOTHING RETURNING {target}
+"""
+DELETE = """
+    DELETE FROM {table} WHERE {user} = %s AND {target} IN ({ids})
+    RETURNING {target}
+"""
+
+
+def recipes_favorited(user, ids, delta):
+    increment(Recipe.objects.filter(pk__in=ids), 'favorites_count', delta)
+
+
+def recipes_carted(user, ids, delta):
+    change_user_recipes(delta, user.id, ids)
+
+
+def authors_followed(user, ids, delta):
+    increment(User.objects.filter(pk__in=ids), 'followers_count', delta)
+
+
+# Model: (field linking the target, what the model signals would do).
+LINKS = {
+    Favorite: ('recipe', recipes_favorited),
+    ShoppingCart: ('recipe', recipes_carted),
+    Follow: ('author', authors_followed),
+}
+
+
+def execute_links(sql, model, user, ids):
+    field = model._meta.get_field(LINKS[model][0])
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(
+            table=model._meta.db_table,
+            user=model._meta.get_field('user').column,
+            target=field.column,
+            targets=field.related_model._meta.db_table,
+            ids=', '.join(['%s'] * len(ids))), [user.id, *ids])
+        return {pk for pk, in cursor.fetchall()}
+
+
+def change_links(request, model, ids, add):
+    """Link the request user to every object of ids, or unlink them.
+
+    A single INSERT or DELETE relies on the unique constraints instead
+    of checking each id first. Bulk statements send no signals, so the
+    counters and cart items are updated here, as are the relations
+    already loaded for the request. Returns the ids that changed.
+    """
+    user = request.user
+    with transaction.atomic():
+        changed = execute_links(INSERT if add else DELETE, model, user, ids)
+        if changed:
+            LINKS[model][1](user, changed, 1 if add else -1)
+    relations = get_user_relations(request)
+    for name, (related_model, column) in RELATIONS.items():
+        if related_model is model and name in relations.sets:
+            if add:
+                relations.sets[name] |= changed
+            else:
+                relations.sets[name] -= changed
+    return changed
+
+
+def get_existing(model, ids):
+    """Return the ids among ids of existing link targets of the model."""
+    if not ids:
+        return set()
+    targets = model._meta.get_field(LINKS[model][0]).related_model.objects
+    return set(targets.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def get_status(pk, add, changed, existing, excluded):
+    if pk in excluded:
+        return 'excluded'
+    if pk in changed:
+        return 'added' if add else 'deleted'
+    if not add:
+        return 'missing'
+    return 'exists' if pk in existing else 'not_found'
+
+
+def batch_results(request, model, ids, excluded=()):
+    """Apply a batch request and describe the outcome for every id.
+
+    POST adds the links: added, exists or not_found. DELETE removes
+    them: deleted or missing. Ids in excluded are left alone.
+    """
+    ids = list(dict.fromkeys(ids))
+    allowed = [pk for pk in ids if pk not in excluded]
+    add = request.method == 'POST'
+    changed = change_links(request, model, allowed, add) if (
+        allowed) else set()
+    existing = get_existing(
+        model, [pk for pk in allowed if pk not in changed]) if add else set()
+    return [{'id': pk,
+             'status': get_status(pk, add, changed, existing, excluded)}
+            for pk in ids]
@@ -0,0 +1,215 @@
+import hashlib
+import time
+from functools import partial
+from threading import Lock
+from urllib.parse import urlencode
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
+
+GENERATION_KEY = 'api:generation:{}'
+RESPONSE_KEY = 'api:response:{}:{}'
+CHANGES_KEY = 'api:changes:{}:{}'
+# A worker further behind rebuilds its index instead of updating it.
+MAX_CHANGES = 100
+CHANGES_TIMEOUT = 60 * 60
+
+
+def get_generation(name):
+    """Return the current generation of a group of cached responses.
+
+    A missing counter starts from the current time rather than from one,
+    so an evicted counter never brings back responses of an older
+    generation.
+    """
+    key = GENERATION_KEY.format(name)
+    cache.add(key, time.time_ns(), timeout=None)
+    return cache.get(key)
+
+
+def bump_generation(*names):
+    """Invalidate every cached response of the given groups."""
+    for name in names:
+        key = GENERATION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def bump_generation_on_commit(*names):
+    """Bump the generations once the current transaction commits.
+
+    Bumping earlier would let another worker cache data read before the
+    commit under the new generation.
+    """
+    transaction.on_commit(partial(bump_generation, *names))
+
+
+class LazyIndex:
+    """Process-local index rebuilt when its cache generation changes.
+
+    The index is built on first use and kept between requests. Bumping
+    the generation from any process makes every worker rebuild it on
+    its next use. Indexes given an update function are updated in place
+    instead for the keys passed to changed(), which are kept in the
+    shared cache under the generation they produced.
+    """
+
+    def __init__(self, generation, build, update=None):
+        self.generation = generation
+        self.build = build
+        self.update = update
+        self.index = None
+        self.built_generation = None
+        self.lock = Lock()
+
+    def get(self):
+        generation = get_generation(self.generation)
+        with self.lock:
+            if self.index is None or self.built_generation != generation:
+                keys = self.get_changes(generation)
+                if keys is None:
+                    self.index = self.build()
+                else:
+                    self.update(self.index, keys)
+                self.built_generation = generation
+            return self.index
+
+    async def aget(self):
+        """get() for async views, only a rebuild runs in a thread."""
+        index = self.index
+        if index is not None and self.built_generation == get_generation(
+                self.generation):
+            return index
+        return await sync_to_async(self.get)()
+
+    def get_changes(self, generation):
+        """Keys changed since the index was built, None if unknown."""
+        if self.update is None or self.index is None:
+            return None
+        count = generation - self.built_generation
+        if not 0 < count <= MAX_CHANGES:
+            return None
+        changes = cache.get_many([
+            CHANGES_KEY.format(self.generation, number)
+            for number in range(self.built_generation + 1, generation + 1)])
+        if len(changes) != count:
+            return None
+        return set().union(*changes.values())
+
+    def invalidate(self, **kwargs):
+        bump_generation_on_commit(self.generation)
+
+    def changed(self, *keys):
+        """Update the entries of keys once the transaction commits."""
+        transaction.on_commit(partial(self.publish_changes, keys))
+
+    def publish_changes(self, keys):
+        key = GENERATION_KEY.format(self.generation)
+        try:
+            generation = cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+            return
+        cache.set(CHANGES_KEY.format(self.generation, generation), keys,
+                  CHANGES_TIMEOUT)
+
+
+class CachedResponseMixin:
+    """Cache list and retrieve responses of anonymous users.
+
+    Responses are keyed by the URL and the normalized cache_query_params
+    and tagged with the generation of cache_generation, which signal
+    handlers bump whenever the underlying data changes. Requests with
+    other query parameters are not cached. The ETag is derived from the
+    key, so If-None-Match is answered without reading the cache.
+    """
+    cache_generation = None
+    cache_query_params = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        if not request.user.is_anonymous:
+            return None
+        params = request.query_params
+        if set(params) - set(self.cache_query_params):
+            return None
+        query = urlencode(sorted(
+            (name, value)
+            for name in self.cache_query_params
+            for value in params.getlist(name) if value))
+        digest = hashlib.sha1(
+            f'{request.build_absolute_uri(request.path)}?{query}'.encode()
+        ).hexdigest()
+        return RESPONSE_KEY.format(
+            get_generation(self.cache_generation), digest)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        if key is None:
+            return handler(request, *args, **kwargs)
+        etag = get_etag(key)
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            return tag_response(Response(status=HTTP_304_NOT_MODIFIED), etag)
+        data = cache.get(key)
+        if data is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != HTTP_200_OK:
+                return response
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+        return tag_response(response, etag)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().alist, request, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self.acached_response(
+            super().aretrieve, request, *args, **kwargs)
+
+    async def acached_response(self, handler, request, *args, **kwargs):
+        """cached_response for the async handlers of AsyncReadMixin."""
+        key = self.get_cache_key(request)
+        if key is None:
+            return await handler(request, *args, **kwargs)
+        etag = get_etag(key)
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            return tag_response(Response(status=HTTP_304_NOT_MODIFIED), etag)
+        # The async cache API of the built-in backends only moves the
+        # call to a worker thread, which costs more than reading a file.
+        data = cache.get(key)
+        if data is None:
+            response = await handler(request, *args, **kwargs)
+            if response.status_code != HTTP_200_OK:
+                return response
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        else:
+            response = Response(data)
+        return tag_response(response, etag)
+
+
+def get_etag(key):
+    """The ETag is derived from the key, the key changes with the data."""
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+
+def tag_response(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Authorization',))
+    return response
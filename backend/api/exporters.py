@@ -0,0 +1,165 @@
+import csv
+import json
+import logging
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from datetime import datetime
+from itertools import groupby
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+logger = logging.getLogger(__name__)
+
+# Units that can be folded into a base unit before summing.
+UNIT_CONVERSIONS = {
+    'кг': ('г', 1000),
+    'л': ('мл', 1000),
+    'шт': ('шт.', 1),
+}
+
+PDF_FONT_NAME = 'ShoppingListFont'
+
+
+def normalize_unit(unit, amount):
+    """Return the amount expressed in the base measurement unit."""
+    unit = unit.strip()
+    base_unit, factor = UNIT_CONVERSIONS.get(unit, (unit, 1))
+    return base_unit, amount * factor
+
+
+def merge_ingredients(rows):
+    """Merge aggregated rows that share an ingredient name.
+
+    Rows must be ordered by name. Amounts in convertible units are summed
+    in the base unit, the other units are kept side by side.
+    """
+    for name, group in groupby(rows, key=lambda row: row['name']):
+        amounts = {}
+        for row in group:
+            unit, amount = normalize_unit(
+                row['measurement_unit'], row['amount'])
+            amounts[unit] = amounts.get(unit, 0) + amount
+        yield name, list(amounts.items())
+
+
+class Echo:
+    """File-like object that returns written values instead of storing."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListExporter(ABC):
+    """Base shopping list exporter yielding the document piece by piece."""
+    content_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def __init__(self, user, items):
+        self.user = user
+        self.items = items
+
+    @property
+    def filename(self):
+        return f'{self.user.username}_shopping_list.{self.extension}'
+
+    @abstractmethod
+    def __iter__(self):
+        """Yield the parts of the document."""
+
+
+class TxtExporter(ShoppingListExporter):
+
+    def __iter__(self):
+        yield (f'Корзина пользователя: {self.user.username}\n\n'
+               f'Дата: {datetime.today():%Y-%m-%d}\n\n')
+        for name, amounts in self.items:
+            yield f'- {name} - ' + ', '.join(
+                f'{amount}{unit}' for unit, amount in amounts) + '\n'
+
+
+class CsvExporter(ShoppingListExporter):
+    content_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def __iter__(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(
+            ('Ингредиент', 'Количество', 'Единица измерения'))
+        for name, amounts in self.items:
+            for unit, amount in amounts:
+                yield writer.writerow((name, amount, unit))
+
+
+class JsonExporter(ShoppingListExporter):
+    content_type = 'application/json'
+    extension = 'json'
+
+    def __iter__(self):
+        separator = '['
+        for name, amounts in self.items:
+            yield separator + json.dumps(
+                {'name': name,
+                 'amounts': [{'amount': amount, 'measurement_unit': unit}
+                             for unit, amount in amounts]},
+                ensure_ascii=False)
+            separator = ','
+        yield ']' if separator == ',' else '[]'
+
+
+class PdfExporter(ShoppingListExporter):
+    """PDF exporter.
+
+    A PDF can only be written once its cross-reference table is known, so
+    the document is spooled to a temporary file and streamed from there.
+    """
+    content_type = 'application/pdf'
+    extension = 'pdf'
+    font_size = 12
+    line_height = 18
+    margin = 50
+    chunk_size = 64 * 1024
+
+    def get_font(self):
+        font_path = settings.SHOPPING_LIST_PDF_FONT
+        if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+            return PDF_FONT_NAME
+        if os.path.exists(font_path):
+            pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+            return PDF_FONT_NAME
+        logger.warning('Шрифт %s не найден, используется Helvetica.',
+                       font_path)
+        return 'Helvetica'
+
+    def draw(self, file):
+        font = self.get_font()
+        _, height = A4
+        pdf = canvas.Canvas(file, pagesize=A4)
+        pdf.setFont(font, self.font_size)
+        y = height - self.margin
+        for line in TxtExporter(self.user, self.items):
+            for text in line.rstrip('\n').split('\n'):
+                if y < self.margin:
+                    pdf.showPage()
+                    pdf.setFont(font, self.font_size)
+                    y = height - self.margin
+                pdf.drawString(self.margin, y, text)
+                y -= self.line_height
+        pdf.save()
+
+    def __iter__(self):
+        with tempfile.SpooledTemporaryFile(
+                max_size=settings.SHOPPING_LIST_PDF_SPOOL_SIZE) as file:
+            self.draw(file)
+            file.seek(0)
+            yield from iter(lambda: file.read(self.chunk_size), b'')
+
+
+EXPORTERS = {
+    exporter.extension: exporter
+    for exporter in (TxtExporter, CsvExporter, JsonExporter, PdfExporter)
+}
@@ -1,23 +1,17 @@
 from django_filters.rest_framework import FilterSet, filters
 
-from cookbook.models import Ingredient, Recipe, Tag
-
-
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
-
-    class Meta:
-        model = Ingredient
-        fields = ['name', ]
+from api.registry import tag_registry
+from cookbook.models import Recipe
+from cookbook.search import search_recipes
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=lambda: tag_registry.get().choices(),
+        method='filter_tags',
     )
 
+    search = filters.CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
@@ -26,6 +20,16 @@ class RecipeFilter(FilterSet):
         model = Recipe
         fields = ('author', 'tags',)
 
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        ids_by_slug = tag_registry.get().ids_by_slug
+        return queryset.filter(
+            tags__in=[ids_by_slug[slug] for slug in value]).distinct()
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
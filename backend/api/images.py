@@ -0,0 +1,119 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+from api.cache import bump_generation
+from cookbook.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants'
+# Variant name: (bounding box, format). None keeps the family of the
+# original: PNG for images that may be transparent, JPEG otherwise.
+VARIANTS = {
+    'card': ((480, 480), None),
+    'card_webp': ((480, 480), 'webp'),
+    'detail': ((1200, 1200), None),
+    'detail_webp': ((1200, 1200), 'webp'),
+}
+PIL_FORMATS = {'jpg': 'JPEG', 'png': 'PNG', 'webp': 'WEBP'}
+TRANSPARENT_EXTENSIONS = ('.png', '.gif', '.webp')
+QUALITY = 82
+
+pending = set()
+pending_lock = Lock()
+
+
+def variant_names(name):
+    """Storage names of every variant of a stored image.
+
+    The names only depend on the name of the original, which is a hash
+    of its content, so identical uploads share their variants too.
+    """
+    stem, extension = os.path.splitext(os.path.basename(name))
+    original_format = (
+        'png' if extension.lower() in TRANSPARENT_EXTENSIONS else 'jpg')
+    return {
+        variant: f'{VARIANTS_DIR}/{stem}-{variant.split("_")[0]}.'
+                 f'{image_format or original_format}'
+        for variant, (_, image_format) in VARIANTS.items()}
+
+
+def render(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail(size, Image.LANCZOS)
+    if image_format == 'jpg' and variant.mode != 'RGB':
+        variant = variant.convert('RGB')
+    file = BytesIO()
+    variant.save(file, PIL_FORMATS[image_format], quality=QUALITY)
+    return file.getvalue()
+
+
+def build_variants(name):
+    """Write the missing variants of an image and record them on recipes.
+
+    Returns the number of recipes whose variants were recorded.
+    """
+    names = variant_names(name)
+    missing = {variant: variant_name
+               for variant, variant_name in names.items()
+               if not default_storage.exists(variant_name)}
+    if missing:
+        with default_storage.open(name) as file:
+            image = Image.open(file)
+            image.load()
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        for variant, variant_name in missing.items():
+            size = VARIANTS[variant][0]
+            image_format = os.path.splitext(variant_name)[1].lstrip('.')
+            saved = default_storage.save(variant_name, ContentFile(
+                render(image, size, image_format)))
+            if saved != variant_name:
+                # Another process has written the same variant meanwhile.
+                default_storage.delete(saved)
+    updated = Recipe.objects.filter(image=name).exclude(
+        image_variants=names).update(image_variants=names)
+    if updated:
+        bump_generation('recipes')
+    return updated
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.IMAGE_WORKERS,
+        thread_name_prefix='image-variants')
+
+
+def run(name):
+    try:
+        build_variants(name)
+    except Exception:
+        logger.exception('Не удалось создать варианты изображения %s', name)
+    finally:
+        with pending_lock:
+            pending.discard(name)
+        connections.close_all()
+
+
+def schedule_variants(name):
+    """Build the variants of an image in the background worker pool.
+
+    An image already waiting for the workers is not queued again.
+    """
+    with pending_lock:
+        if name in pending:
+            return
+        pending.add(name)
+    get_executor().submit(run, name)
@@ -0,0 +1,172 @@
+import codecs
+import csv
+import json
+import re
+import time
+from dataclasses import dataclass
+from itertools import islice
+
+from django.db import transaction
+
+from api.autocomplete import ingredient_index
+from cookbook.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+DEFAULT_BATCH_SIZE = 1000
+IMPORT_FORMATS = ('csv', 'json')
+
+WHITESPACE = re.compile(r'\s*')
+NUMBER_START = '-0123456789'
+NUMBER_END = re.compile(r'[\s,\]}]')
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    skipped: int = 0
+    seconds: float = 0
+
+    @property
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else self.rows
+
+    def __str__(self):
+        return (f'Обработано строк: {self.rows}, добавлено: {self.created}, '
+                f'пропущено: {self.skipped} за {self.seconds:.2f} с '
+                f'({self.rate:.0f} строк/с).')
+
+
+class JsonArrayReader:
+    """Iterate over the items of a top-level JSON array chunk by chunk."""
+
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def read(self):
+        """Append the next chunk to the unread part of the buffer."""
+        chunk = self.file.read(self.chunk_size)
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        self.eof = not chunk
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            self.position = WHITESPACE.match(
+                self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                raise ValueError('Неожиданный конец JSON-документа.')
+            self.read()
+
+    def expect(self, chars, message):
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(message)
+        self.position += 1
+        return char
+
+    def decode(self):
+        """Decode the value at the current position.
+
+        A value may be cut in half by the chunk boundary. A number is only
+        complete once a delimiter follows it, other values fail to decode
+        or reach the end of the buffer until they are read in full.
+        """
+        while True:
+            char = self.peek()
+            try:
+                item, end = self.decoder.raw_decode(
+                    self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                end = len(self.buffer)
+            if self.eof or not (
+                    end == len(self.buffer)
+                    or char in NUMBER_START
+                    and not NUMBER_END.search(self.buffer, end)):
+                self.position = end
+                return item
+            self.read()
+
+    def __iter__(self):
+        self.expect('[', 'Ожидался JSON-массив.')
+        if self.peek() == ']':
+            return
+        while True:
+            yield self.decode()
+            if self.expect(
+                    ',]', 'Ожидалась запятая между элементами.') == ']':
+                return
+
+
+def read_csv(file):
+    """Yield (name, measurement_unit) pairs from a CSV text stream."""
+    try:
+        for row in csv.reader(file):
+            if not row or not any(row):
+                continue
+            if len(row) < 2:
+                raise ValueError(f'Ожидалось два столбца, получено: {row}')
+            yield row[0], row[1]
+    except csv.Error as error:
+        raise ValueError(str(error))
+
+
+def read_json(file):
+    """Yield (name, measurement_unit) pairs from a JSON array of objects."""
+    for item in JsonArrayReader(file):
+        try:
+            yield item['name'], item['measurement_unit']
+        except (KeyError, TypeError):
+            raise ValueError(f'Некорректный элемент: {item}')
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def decode(file, encoding='utf-8'):
+    """Wrap a binary file, such as an upload, into a text stream."""
+    return codecs.getreader(encoding)(file)
+
+
+def import_ingredients(file, file_format, batch_size=DEFAULT_BATCH_SIZE):
+    """Import ingredients from a text stream in a single transaction.
+
+    Rows are inserted with bulk_create in batches. Duplicates of
+    (name, measurement_unit), both within the file and already stored,
+    are skipped. Rows with an empty or too long value are skipped too.
+    """
+    max_length = Ingredient._meta.get_field('name').max_length
+    report = ImportReport()
+    started = time.perf_counter()
+    seen = set()
+
+    def ingredients():
+        for name, measurement_unit in READERS[file_format](file):
+            report.rows += 1
+            pair = (name.strip(), measurement_unit.strip())
+            if (pair in seen or not all(pair)
+                    or max(map(len, pair)) > max_length):
+                continue
+            seen.add(pair)
+            yield Ingredient(name=pair[0], measurement_unit=pair[1])
+
+    with transaction.atomic():
+        count = Ingredient.objects.count()
+        batches = ingredients()
+        for batch in iter(lambda: list(islice(batches, batch_size)), []):
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        report.created = Ingredient.objects.count() - count
+        transaction.on_commit(ingredient_index.invalidate)
+    report.skipped = report.rows - report.created
+    report.seconds = time.perf_counter() - started
+    return report
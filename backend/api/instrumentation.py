@@ -0,0 +1,243 @@
+import logging
+import os
+import re
+import socket
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from api.authentication import get_token_cache_report, token_cache_stats
+
+logger = logging.getLogger(__name__)
+
+PERCENTILES = (50, 95, 99)
+METRICS = ('queries', 'db_ms', 'serialize_ms', 'render_ms', 'total_ms',
+           'size')
+
+IN_LIST = re.compile(r'IN \((?:%s|\?)(?:, ?(?:%s|\?))*\)')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+SPACES = re.compile(r'\s+')
+
+WORKERS_KEY = 'api:instrumentation:workers'
+WORKER_STATS_KEY = 'api:instrumentation:worker:{}'
+# Samples of a worker that stopped publishing are dropped after an hour.
+WORKER_STATS_TIMEOUT = 60 * 60
+
+route_stats = {}
+published = {'at': None}
+
+
+def fingerprint(sql):
+    """Reduce a query to its shape so repeated queries can be counted."""
+    sql = SPACES.sub(' ', sql)
+    sql = LITERAL.sub('?', sql)
+    return IN_LIST.sub('IN (...)', sql)
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = round(percent / 100 * (len(values) - 1))
+    return values[index]
+
+
+def get_worker():
+    """Name of the worker process, unique across hosts."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def publish_stats(force=False):
+    """Copy the samples of this worker to the shared cache.
+
+    Every worker writes its own key, at most once per
+    QUERY_INSTRUMENTATION_PUBLISH seconds unless forced, so requests do
+    not wait on the cache and the report sees every worker. The worker
+    is added back to the list of workers on every copy, in case the
+    list was evicted or another worker overwrote it meanwhile.
+    """
+    now = time.monotonic()
+    if not force and published['at'] is not None and (
+            now - published['at'] < settings.QUERY_INSTRUMENTATION_PUBLISH):
+        return
+    published['at'] = now
+    worker = get_worker()
+    cache.set(WORKER_STATS_KEY.format(worker), {
+        'routes': {route: list(samples)
+                   for route, samples in route_stats.items()},
+        'token_cache': dict(token_cache_stats), }, WORKER_STATS_TIMEOUT)
+    workers = cache.get(WORKERS_KEY) or set()
+    if worker not in workers:
+        cache.set(WORKERS_KEY, workers | {worker}, timeout=None)
+
+
+def collect_stats():
+    """Merge the published samples and token cache counts of all
+    workers, forgetting the workers whose samples expired."""
+    publish_stats(force=True)
+    workers = cache.get(WORKERS_KEY) or set()
+    found = cache.get_many([
+        WORKER_STATS_KEY.format(worker) for worker in workers])
+    if len(found) < len(workers):
+        cache.set(WORKERS_KEY, {
+            worker for worker in workers
+            if WORKER_STATS_KEY.format(worker) in found}, timeout=None)
+    routes = {}
+    token_cache = Counter()
+    for stats in found.values():
+        for route, samples in stats['routes'].items():
+            routes.setdefault(route, []).extend(samples)
+        token_cache.update(stats['token_cache'])
+    return routes, token_cache
+
+
+def get_report():
+    """Return percentiles of every metric for every recorded route.
+
+    Samples of all workers are merged, the ones of other workers are up
+    to QUERY_INSTRUMENTATION_PUBLISH seconds old. The hit rate of the
+    token cache is reported under token_cache.
+    """
+    routes, token_cache = collect_stats()
+    report = {'token_cache': get_token_cache_report(token_cache)}
+    for route, samples in sorted(routes.items()):
+        report[route] = {'requests': len(samples)}
+        for position, metric in enumerate(METRICS):
+            values = [sample[position] for sample in samples
+                      if sample[position] is not None]
+            report[route][metric] = {
+                f'p{percent}': percentile(values, percent)
+                for percent in PERCENTILES
+            } if values else None
+    return report
+
+
+def add_serialize_duration(request, duration):
+    request = getattr(request, '_request', request)
+    if hasattr(request, 'serialize_duration'):
+        request.serialize_duration = (
+            request.serialize_duration or 0) + duration
+
+
+class SerializationTimingMixin:
+    """Time the serializers of the view built with get_serializer.
+
+    Their to_representation is wrapped, so serialize_ms covers turning
+    objects into primitives, including the queries run meanwhile, but
+    not rendering them to JSON.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if not settings.QUERY_INSTRUMENTATION:
+            return serializer
+        to_representation = serializer.to_representation
+        request = self.request
+
+        def timed_to_representation(instance):
+            started = time.perf_counter()
+            try:
+                return to_representation(instance)
+            finally:
+                add_serialize_duration(
+                    request, time.perf_counter() - started)
+
+        serializer.to_representation = timed_to_representation
+        return serializer
+
+
+class QueryRecorder:
+    """Database execute wrapper counting queries and their duration."""
+
+    def __init__(self):
+        self.queries = Counter()
+        self.count = 0
+        self.duration = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.queries[fingerprint(sql)] += 1
+
+    def repeated(self):
+        return [(sql, count) for sql, count in self.queries.most_common()
+                if count >= settings.QUERY_REPEAT_THRESHOLD]
+
+
+class QueryInstrumentationMiddleware:
+    """Measure queries, database, serialization and rendering time and
+    response size.
+
+    Serialization is timed in views using SerializationTimingMixin,
+    rendering covers the renderer turning serialized data into bytes.
+    Enabled by the QUERY_INSTRUMENTATION setting. The numbers are sent in
+    the Server-Timing header and collected per route for the admin-only
+    report, which merges the samples every worker publishes to the
+    shared cache. Requests above QUERY_BUDGET queries are logged together with
+    the queries repeated within them, which usually point to an N+1.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERY_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.serialize_duration = None
+        request.render_duration = None
+        started = time.perf_counter()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        total = time.perf_counter() - started
+        self.record(request, response, recorder, total)
+        return response
+
+    def process_template_response(self, request, response):
+        started = time.perf_counter()
+
+        def rendered(response):
+            request.render_duration = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+    def record(self, request, response, recorder, total):
+        match = request.resolver_match
+        route = (f'{request.method} /{match.route.rstrip("$")}'
+                 if match else 'unresolved')
+        size = None if response.streaming else len(response.content)
+        serialize = request.serialize_duration
+        render = request.render_duration
+        timings = [
+            f'db;dur={recorder.duration * 1000:.1f};'
+            f'desc="{recorder.count} queries"',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if render is not None:
+            timings.insert(1, f'render;dur={render * 1000:.1f}')
+        if serialize is not None:
+            timings.insert(1, f'serialize;dur={serialize * 1000:.1f}')
+        response['Server-Timing'] = ', '.join(timings)
+        route_stats.setdefault(route, deque(
+            maxlen=settings.QUERY_INSTRUMENTATION_SAMPLES)).append((
+                recorder.count,
+                round(recorder.duration * 1000, 2),
+                None if serialize is None else round(serialize * 1000, 2),
+                None if render is None else round(render * 1000, 2),
+                round(total * 1000, 2),
+                size, ))
+        publish_stats()
+        if recorder.count > settings.QUERY_BUDGET:
+            logger.warning(
+                '%s %s: %d запросов (бюджет %d), %.1f мс в БД. '
+                'Повторяющиеся запросы: %s',
+                request.method, request.get_full_path(), recorder.count,
+                settings.QUERY_BUDGET, recorder.duration * 1000,
+                recorder.repeated() or 'нет')
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+BENCHMARK_TESTS = os.path.join(
+    settings.BASE_DIR, 'api', 'tests', 'test_benchmark.py')
+
+
+class Command(BaseCommand):
+    help = ('Запускает тесты производительности api/tests/test_benchmark.py: '
+            'время ответа, количество запросов к БД и пиковое потребление '
+            'памяти основных эндпоинтов API на тестовой базе, наполненной '
+            'seed_synthetic.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int,
+            help='Количество пользователей в тестовой базе.')
+        parser.add_argument(
+            '--recipes', type=int,
+            help='Количество рецептов в тестовой базе.')
+        parser.add_argument(
+            '--repeat', type=int,
+            help='Количество повторов каждого запроса.')
+        parser.add_argument(
+            '--output',
+            help='Сохранить результаты в JSON-файл.')
+        parser.add_argument(
+            '--baseline',
+            help='Сравнить результаты с ранее сохранённым JSON-файлом.')
+        parser.add_argument(
+            '--tolerance', type=float,
+            help='Допустимый относительный рост времени ответа '
+                 'по сравнению с базовым замером.')
+
+    def handle(self, *args, **options):
+        arguments = [BENCHMARK_TESTS, '-q', '-p', 'no:cacheprovider']
+        for option, pytest_option in (
+                ('users', 'seed-users'), ('recipes', 'seed-recipes'),
+                ('repeat', 'benchmark-repeat'),
+                ('output', 'benchmark-output'),
+                ('baseline', 'benchmark-baseline'),
+                ('tolerance', 'benchmark-tolerance')):
+            if options[option] is not None:
+                arguments.append(f'--{pytest_option}={options[option]}')
+        code = pytest.main(arguments)
+        if code:
+            raise CommandError(
+                f'Тесты производительности завершились с кодом {int(code)}.')
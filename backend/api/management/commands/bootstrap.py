@@ -0,0 +1,158 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+
+from api.cache import bump_generation
+from api.importers import JsonArrayReader
+from cookbook.carts import reconcile
+from cookbook.counters import recount
+from cookbook.search import update_search_index
+
+DEFAULT_FIXTURE = os.path.join(settings.BASE_DIR, 'data', 'foodgram_db.json')
+DEFAULT_BATCH_SIZE = 1000
+
+
+def dependency_order(models):
+    """Sort models so that every model follows the models it refers to."""
+    ordered, visiting = {}, set()
+
+    def visit(model):
+        if model in ordered or model in visiting:
+            return
+        visiting.add(model)
+        for field in model._meta.concrete_fields:
+            if field.is_relation and field.related_model in models:
+                visit(field.related_model)
+        ordered[model] = None
+
+    for model in sorted(models, key=lambda model: model._meta.label):
+        visit(model)
+    return list(ordered)
+
+
+@contextmanager
+def raw_dates(model):
+    """Keep fixture values of auto_now and auto_now_add fields.
+
+    bulk_create fills such fields on insert, unlike the raw saves done by
+    loaddata, so they are switched off while the model is inserted.
+    """
+    fields = [field for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class FixtureLoader:
+    """Group fixture objects by model and insert them in bulk."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = defaultdict(list)
+        self.models = set()
+        self.count = 0
+
+    def add(self, item):
+        for deserialized in serializers.deserialize('python', [item]):
+            instance = deserialized.object
+            self.append(type(instance), instance)
+            for name, values in deserialized.m2m_data.items():
+                field = instance._meta.get_field(name)
+                through = field.remote_field.through
+                if not through._meta.auto_created:
+                    continue
+                for value in values:
+                    self.append(through, through(**{
+                        field.m2m_field_name() + '_id': instance.pk,
+                        field.m2m_reverse_field_name() + '_id': value, }))
+
+    def append(self, model, instance):
+        self.pending[model].append(instance)
+        self.models.add(model)
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush_model(model)
+
+    def flush_model(self, model):
+        objects = self.pending.pop(model, [])
+        if not objects:
+            return
+        opts = model._meta
+        update_fields = [field.name for field in opts.concrete_fields
+                         if not field.primary_key]
+        with raw_dates(model):
+            if opts.auto_created or not update_fields:
+                model.objects.bulk_create(objects, ignore_conflicts=True)
+            else:
+                model.objects.bulk_create(
+                    objects,
+                    update_conflicts=True,
+                    unique_fields=[opts.pk.name],
+                    update_fields=update_fields, )
+        self.count += len(objects)
+
+    def flush(self):
+        for model in dependency_order(self.models):
+            self.flush_model(model)
+
+
+class Command(BaseCommand):
+    help = ('Быстро загружает фикстуру в базу данных: объекты читаются '
+            'потоково и вставляются пакетами по моделям.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_FIXTURE,
+            help='Путь к JSON-фикстуре.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество объектов в одном INSERT.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        loader = FixtureLoader(options['batch_size'])
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                with transaction.atomic():
+                    with connection.constraint_checks_disabled():
+                        for item in JsonArrayReader(file):
+                            loader.add(item)
+                        loader.flush()
+                    connection.check_constraints(table_names=[
+                        model._meta.db_table for model in loader.models])
+                    recount()
+                    reconcile()
+                    update_search_index()
+        except (OSError, ValueError, DatabaseError,
+                serializers.base.DeserializationError) as error:
+            raise CommandError(f'Невозможно загрузить фикстуру: {error}')
+        self.reset_sequences(loader.models)
+        bump_generation(
+            'recipes', 'tags', 'ingredients', 'recipe_ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено объектов: {loader.count} '
+            f'за {time.perf_counter() - started:.2f} с.'))
+
+    def reset_sequences(self, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
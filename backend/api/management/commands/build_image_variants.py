@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api.images import build_variants, variant_names
+from cookbook.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создаёт уменьшенные копии изображений рецептов, у которых '
+            'их ещё нет, например после bootstrap или seed_synthetic.')
+
+    def handle(self, *args, **options):
+        images = Recipe.objects.exclude(image='').values_list(
+            'image', 'image_variants').distinct()
+        names = sorted({name for name, variants in images
+                        if variants != variant_names(name)})
+        updated = failed = 0
+        for name in names:
+            try:
+                updated += build_variants(name)
+            except (OSError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений обработано: {len(names) - failed}, '
+            f'ошибок: {failed}, обновлено рецептов: {updated}.'))
@@ -0,0 +1,37 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.importers import (DEFAULT_BATCH_SIZE, IMPORT_FORMATS,
+                           import_ingredients)
+
+
+class Command(BaseCommand):
+    help = 'Загружает ингредиенты из CSV- или JSON-файла.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу с ингредиентами.')
+        parser.add_argument(
+            '--format',
+            choices=IMPORT_FORMATS,
+            help='Формат файла. По умолчанию определяется по расширению.')
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Количество строк в одном INSERT.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in IMPORT_FORMATS:
+            raise CommandError(
+                'Укажите формат файла: ' + ', '.join(IMPORT_FORMATS))
+        try:
+            with open(path, encoding='utf-8', newline='') as file:
+                report = import_ingredients(
+                    file, file_format, options['batch_size'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Невозможно загрузить файл: {error}')
+        self.stdout.write(self.style.SUCCESS(str(report)))
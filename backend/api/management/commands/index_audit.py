@@ -0,0 +1,167 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, F, Sum
+
+from api.pagination import keyset_filter
+from cookbook.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from users.models import Follow, User
+
+PAGE_SIZE = 6
+# "SCAN cookbook_recipe" on SQLite, "Seq Scan on cookbook_recipe" on
+# Postgres. A SQLite SCAN ... USING INDEX walks an index in its order,
+# which stops early under ORDER BY ... LIMIT.
+SQLITE_SCAN = re.compile(
+    r'\bSCAN (?:TABLE )?(\w+)( USING (?:COVERING )?INDEX)?')
+POSTGRES_SCAN = re.compile(r'\bSeq Scan on (\w+)')
+# Checks relying on indexes created only on Postgres.
+POSTGRES_ONLY = ('ingredient_prefix', )
+# Tables small enough for a full scan to be the best plan.
+SMALL_TABLES = (Tag._meta.db_table, )
+
+
+class Command(BaseCommand):
+    help = ('Выполняет EXPLAIN для основных запросов API на текущей базе '
+            'и сообщает о последовательных сканированиях таблиц. '
+            'Для наполнения базы используйте seed_synthetic.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Почта пользователя, от имени которого строятся запросы. '
+                 'По умолчанию - пользователь с самой большой корзиной.')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            raise CommandError(
+                f'База {connection.vendor} не поддерживается.')
+        user = self.get_user(options['user'])
+        failures = []
+        for name, queryset in self.get_queries(user).items():
+            if (name in POSTGRES_ONLY
+                    and connection.vendor != 'postgresql'):
+                self.stdout.write(f'{name}: пропущено, только PostgreSQL')
+                continue
+            plan = self.explain(queryset)
+            scans = self.find_scans(plan, self.is_bounded(queryset))
+            if scans:
+                failures.append(f'{name}: {", ".join(scans)}')
+                self.stdout.write(self.style.ERROR(
+                    f'{name}: последовательное сканирование '
+                    f'{", ".join(scans)}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+            if options['verbosity'] > 1 or scans:
+                self.stdout.write(plan)
+        if failures:
+            raise CommandError(
+                'Запросы без подходящих индексов:\n' + '\n'.join(failures))
+
+    def get_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+            if user is None:
+                raise CommandError(f'Пользователь {email} не найден.')
+            return user
+        user = User.objects.annotate(
+            cart_size=Count('carts')).order_by('-cart_size', 'id').first()
+        if user is None:
+            raise CommandError('База пуста, запустите seed_synthetic.')
+        return user
+
+    def get_queries(self, user):
+        """Querysets of the API read path, keyed by a short name."""
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        tag = Tag.objects.order_by('id').first()
+        ingredient = Ingredient.objects.order_by('id').first()
+        if recipe is None or tag is None or ingredient is None:
+            raise CommandError('Недостаточно данных, запустите '
+                               'seed_synthetic.')
+        recipes = Recipe.objects.all()
+        return {
+            'recipes_list': recipes.order_by(
+                '-pub_date', '-id')[:PAGE_SIZE],
+            'recipes_keyset': recipes.filter(keyset_filter(
+                (('pub_date', True), ('id', True)),
+                (recipe.pub_date, recipe.id), True)).order_by(
+                '-pub_date', '-id')[:PAGE_SIZE],
+            'recipes_by_author': recipes.filter(
+                author=recipe.author_id).order_by(
+                '-pub_date', '-id')[:PAGE_SIZE],
+            'recipes_by_tag': recipes.filter(
+                tags__slug=tag.slug).order_by('-pub_date', '-id')[:PAGE_SIZE],
+            'recipes_favorited': recipes.filter(
+                favorites__user=user).order_by(
+                '-pub_date', '-id')[:PAGE_SIZE],
+            'recipes_in_cart': recipes.filter(
+                in_carts__user=user).order_by('-pub_date', '-id')[:PAGE_SIZE],
+            'user_favorites': Favorite.objects.filter(
+                user=user).values_list('recipe_id'),
+            'favorite_exists': Favorite.objects.filter(
+                user=user, recipe=recipe),
+            'recipe_favorites': Favorite.objects.filter(recipe=recipe),
+            'user_cart': ShoppingCart.objects.filter(
+                user=user).values_list('recipe_id'),
+            'cart_exists': ShoppingCart.objects.filter(
+                user=user, recipe=recipe),
+            'recipe_carts': ShoppingCart.objects.filter(recipe=recipe),
+            'shopping_cart_export': user.cart_items.values(
+                'amount',
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit'),
+            ).order_by('name', 'measurement_unit'),
+            'recipe_cart_changes': ShoppingCart.objects.filter(
+                recipe=recipe).values(
+                'user', 'recipe__ingredient_list__ingredient').annotate(
+                amount=Sum('recipe__ingredient_list__amount')),
+            'user_follows': Follow.objects.filter(
+                user=user).values_list('author_id'),
+            'follow_exists': Follow.objects.filter(
+                user=user, author=recipe.author_id),
+            'author_followers': Follow.objects.filter(
+                author=recipe.author_id),
+            'subscriptions': User.objects.filter(
+                following__user=user).order_by('username', 'id')[:PAGE_SIZE],
+            'subscription_recipes': Recipe.objects.filter(
+                author=recipe.author_id).latest_by_author(3),
+            'ingredient_prefix': Ingredient.objects.filter(
+                name__istartswith=ingredient.name[:2]),
+        }
+
+    def explain(self, queryset):
+        """Return the plan of the queryset as text.
+
+        QuerySet.explain() breaks on SQLite for queries filtering on a
+        window function, so the compiled SQL is explained directly.
+        """
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('EXPLAIN ' + sql, params)
+                return '\n'.join(row[0] for row in cursor.fetchall())
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def is_bounded(self, queryset):
+        """Whether the queryset reads a limited number of ordered rows."""
+        query = queryset.query
+        return query.high_mark is not None and bool(
+            query.order_by
+            or query.default_ordering and query.get_meta().ordering)
+
+    def find_scans(self, plan, bounded=False):
+        """Tables read in full, scans of subqueries are not reported.
+
+        On SQLite an index walk of a bounded query is not a full read.
+        """
+        if connection.vendor == 'postgresql':
+            found = POSTGRES_SCAN.findall(plan)
+        else:
+            found = [
+                table for table, using_index in SQLITE_SCAN.findall(plan)
+                if not (using_index and bounded)]
+        tables = set(connection.introspection.table_names())
+        return sorted({
+            table for table in found
+            if table in tables and table not in SMALL_TABLES})
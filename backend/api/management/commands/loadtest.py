@@ -0,0 +1,150 @@
+import json
+import statistics
+import threading
+import time
+from http.client import HTTPConnection, HTTPException
+from urllib.parse import quote, urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.instrumentation import percentile
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DURATION = 10
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=са',
+)
+AUTHENTICATED_PATHS = ('/api/users/subscriptions/?recipes_limit=3', )
+
+
+def parse_target(value):
+    name, _, url = value.partition('=')
+    if not url:
+        raise CommandError(f'Ожидается имя=URL, получено {value}.')
+    parts = urlsplit(url)
+    if parts.scheme != 'http' or not parts.hostname:
+        raise CommandError(f'Поддерживается только http: {url}.')
+    return name, parts.hostname, parts.port or 80
+
+
+class Command(BaseCommand):
+    help = ('Нагружает запущенный сервер параллельными GET-запросами к '
+            'основным эндпоинтам и сравнивает запросы в секунду и '
+            'задержки нескольких серверов, например WSGI и ASGI.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='Сервер в виде имя=URL, например '
+                 'wsgi=http://127.0.0.1:8000. Первый служит базой '
+                 'для сравнения. Можно указать несколько раз.')
+        parser.add_argument(
+            '--path', action='append',
+            help='Путь запроса, можно указать несколько раз. По '
+                 'умолчанию - списки рецептов, теги, поиск ингредиентов '
+                 'и, с токеном, подписки.')
+        parser.add_argument(
+            '--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+            help='Количество одновременных соединений.')
+        parser.add_argument(
+            '--duration', type=float, default=DEFAULT_DURATION,
+            help='Длительность нагрузки на каждый сервер в секундах.')
+        parser.add_argument(
+            '--token',
+            help='Токен пользователя. Без него запросы анонимные и '
+                 'в основном попадают в кэш ответов.')
+        parser.add_argument(
+            '--output',
+            help='Сохранить результаты в JSON-файл.')
+
+    def handle(self, *args, **options):
+        targets = [parse_target(value) for value in options['target']]
+        paths = [quote(path, safe='/?=&%') for path in (
+            options['path'] or list(DEFAULT_PATHS) + (
+                list(AUTHENTICATED_PATHS) if options['token'] else []))]
+        headers = {'Connection': 'keep-alive'}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        results = {}
+        for name, host, port in targets:
+            self.stdout.write(f'{name}: {host}:{port}...')
+            results[name] = self.load(
+                host, port, paths, headers,
+                options['concurrency'], options['duration'])
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(results, file, ensure_ascii=False, indent=2)
+
+    def load(self, host, port, paths, headers, concurrency, duration):
+        """Send requests over keep-alive connections until the deadline.
+
+        Every connection sends its next request as soon as the previous
+        response has been read, cycling through the paths.
+        """
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        deadline = time.perf_counter() + duration
+
+        def worker(offset):
+            connection = HTTPConnection(host, port, timeout=30)
+            own_latencies = []
+            own_errors = 0
+            position = offset
+            while time.perf_counter() < deadline:
+                path = paths[position % len(paths)]
+                position += 1
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', path, headers=headers)
+                    response = connection.getresponse()
+                    response.read()
+                except (OSError, HTTPException):
+                    own_errors += 1
+                    connection.close()
+                    continue
+                if response.status >= 400:
+                    own_errors += 1
+                else:
+                    own_latencies.append(time.perf_counter() - started)
+            connection.close()
+            with lock:
+                latencies.extend(own_latencies)
+                errors.append(own_errors)
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(offset, ))
+                   for offset in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if not latencies:
+            raise CommandError(f'{host}:{port} не ответил ни на один '
+                               'запрос.')
+        return {
+            'requests': len(latencies),
+            'errors': sum(errors),
+            'rps': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2), }
+
+    def report(self, results):
+        self.stdout.write(f'{"сервер":<12}{"запросы":>10}{"ошибки":>8}'
+                          f'{"запр./с":>10}{"p50, мс":>10}{"p99, мс":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<12}{result["requests"]:>10}{result["errors"]:>8}'
+                f'{result["rps"]:>10}{result["p50_ms"]:>10}'
+                f'{result["p99_ms"]:>10}')
+        base_name, base = next(iter(results.items()))
+        for name, result in list(results.items())[1:]:
+            self.stdout.write(
+                f'{name} относительно {base_name}: запросы в секунду '
+                f'x{result["rps"] / base["rps"]:.2f}, p99 '
+                f'x{result["p99_ms"] / base["p99_ms"]:.2f}')
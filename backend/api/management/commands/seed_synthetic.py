@@ -0,0 +1,207 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import bump_generation
+from api.management.commands.bootstrap import raw_dates
+from cookbook.carts import reconcile
+from cookbook.counters import recount
+from cookbook.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                             ShoppingCart, Tag)
+from cookbook.search import update_search_index
+from users.models import Follow, User
+
+USERNAME_PREFIX = 'synthetic_'
+PASSWORD = 'synthetic-password'
+IMAGE = 'recipes/synthetic.png'
+TAG_COLORS = ('#E26C2D', '#49B64E', '#8775D2', '#3F7CAC', '#D94F70')
+UNITS = ('г', 'мл', 'шт.', 'ст. л.', 'ч. л.')
+BATCH_SIZE = 1000
+
+
+def zipf_weights(size, exponent):
+    """Cumulative weights of ranks 1..size following Zipf's law."""
+    return list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)))
+
+
+def skewed_count(rng, mean, limit):
+    """Draw a per-user count, most users get few and some get many."""
+    return min(limit, int(rng.expovariate(1 / mean))) if mean else 0
+
+
+def skewed_sample(rng, population, cum_weights, size):
+    """Pick size distinct items, popular items are picked more often."""
+    size = min(size, len(population))
+    picked = set()
+    while len(picked) < size:
+        picked.update(rng.choices(
+            population, cum_weights=cum_weights, k=size - len(picked)))
+    return picked
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, рецептами, '
+            'подписками, избранным и корзинами для замеров '
+            'производительности.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Количество пользователей.')
+        parser.add_argument(
+            '--recipes', type=int, default=5000,
+            help='Количество рецептов.')
+        parser.add_argument(
+            '--ingredients-per-recipe', type=int, default=8,
+            help='Количество ингредиентов в рецепте.')
+        parser.add_argument(
+            '--follows', type=float, default=10,
+            help='Среднее количество подписок на пользователя.')
+        parser.add_argument(
+            '--favorites', type=float, default=20,
+            help='Среднее количество избранных рецептов на пользователя.')
+        parser.add_argument(
+            '--cart', type=float, default=5,
+            help='Среднее количество рецептов в корзине пользователя.')
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help='Показатель распределения Ципфа для популярности '
+                 'авторов, рецептов и ингредиентов.')
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Начальное значение генератора случайных чисел.')
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ранее созданные синтетические данные.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        started = time.perf_counter()
+        self.rng = random.Random(options['seed'])
+        self.skew = options['skew']
+        with transaction.atomic():
+            if options['clear']:
+                User.objects.filter(
+                    username__startswith=USERNAME_PREFIX).delete()
+            tags = self.ensure_tags()
+            ingredients = self.ensure_ingredients(
+                options['ingredients_per_recipe'])
+            users = self.create_users(options['users'])
+            recipes = self.create_recipes(users, options['recipes'], tags)
+            self.create_amounts(
+                recipes, ingredients, options['ingredients_per_recipe'])
+            self.create_follows(users, options['follows'])
+            self.create_user_recipes(
+                Favorite, users, recipes, options['favorites'])
+            self.create_user_recipes(
+                ShoppingCart, users, recipes, options['cart'])
+            recount()
+            reconcile()
+            update_search_index()
+        bump_generation(
+            'recipes', 'tags', 'ingredients', 'recipe_ingredients')
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано пользователей: {len(users)}, рецептов: '
+            f'{len(recipes)} за {time.perf_counter() - started:.2f} с.'))
+
+    def ensure_tags(self):
+        tags = list(Tag.objects.values_list('id', flat=True))
+        if tags:
+            return tags
+        Tag.objects.bulk_create(
+            Tag(name=f'Синтетический {number}', color=color,
+                slug=f'synthetic-{number}')
+            for number, color in enumerate(TAG_COLORS))
+        return list(Tag.objects.values_list('id', flat=True))
+
+    def ensure_ingredients(self, per_recipe):
+        ingredients = list(Ingredient.objects.values_list('id', flat=True))
+        if len(ingredients) >= per_recipe:
+            return ingredients
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=f'Синтетический ингредиент {number}',
+                        measurement_unit=UNITS[number % len(UNITS)])
+             for number in range(max(per_recipe, 100))),
+            ignore_conflicts=True)
+        return list(Ingredient.objects.values_list('id', flat=True))
+
+    def create_users(self, count):
+        start = User.objects.filter(
+            username__startswith=USERNAME_PREFIX).count()
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(username=f'{USERNAME_PREFIX}{number}',
+                  email=f'{USERNAME_PREFIX}{number}@example.com',
+                  first_name='Синтетический',
+                  last_name=f'Пользователь {number}',
+                  password=password)
+             for number in range(start, start + count)),
+            batch_size=BATCH_SIZE)
+        return list(User.objects.filter(
+            username__startswith=USERNAME_PREFIX
+        ).order_by('id').values_list('id', flat=True)[start:])
+
+    def create_recipes(self, users, count, tags):
+        """Create recipes, a few prolific authors write most of them."""
+        authors = self.rng.choices(
+            users, cum_weights=zipf_weights(len(users), self.skew), k=count)
+        now = timezone.now()
+        with raw_dates(Recipe):
+            recipes = Recipe.objects.bulk_create(
+                (Recipe(author_id=author,
+                        name=f'Синтетический рецепт {number}',
+                        text='Описание синтетического рецепта.',
+                        image=IMAGE,
+                        cooking_time=self.rng.randint(5, 180),
+                        pub_date=now - timedelta(
+                            minutes=self.rng.randint(0, 525600)))
+                 for number, author in enumerate(authors)),
+                batch_size=BATCH_SIZE)
+        Recipe.tags.through.objects.bulk_create(
+            (Recipe.tags.through(recipe_id=recipe.id, tag_id=tag)
+             for recipe in recipes
+             for tag in self.rng.sample(
+                 tags, self.rng.randint(1, min(3, len(tags))))),
+            batch_size=BATCH_SIZE)
+        return [recipe.id for recipe in recipes]
+
+    def create_amounts(self, recipes, ingredients, per_recipe):
+        weights = zipf_weights(len(ingredients), self.skew)
+        IngredientAmount.objects.bulk_create(
+            (IngredientAmount(recipe_id=recipe, ingredient_id=ingredient,
+                              amount=self.rng.randint(1, 500))
+             for recipe in recipes
+             for ingredient in skewed_sample(
+                 self.rng, ingredients, weights, per_recipe)),
+            batch_size=BATCH_SIZE)
+
+    def create_follows(self, users, mean):
+        weights = zipf_weights(len(users), self.skew)
+        Follow.objects.bulk_create(
+            (Follow(user_id=user, author_id=author)
+             for user in users
+             for author in skewed_sample(
+                 self.rng, users, weights,
+                 skewed_count(self.rng, mean, len(users)))
+             if author != user),
+            batch_size=BATCH_SIZE)
+
+    def create_user_recipes(self, model, users, recipes, mean):
+        if not recipes:
+            return
+        weights = zipf_weights(len(recipes), self.skew)
+        model.objects.bulk_create(
+            (model(user_id=user, recipe_id=recipe)
+             for user in users
+             for recipe in skewed_sample(
+                 self.rng, recipes, weights,
+                 skewed_count(self.rng, mean, len(recipes)))),
+            batch_size=BATCH_SIZE)
@@ -0,0 +1,89 @@
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from itertools import chain, groupby
+from operator import itemgetter
+
+from api.cache import LazyIndex
+from cookbook.models import IngredientAmount
+
+
+class RecipeIngredientIndex:
+    """Inverted index from ingredients to the recipes using them.
+
+    Every ingredient maps to a sorted array of recipe ids, and every
+    recipe to the array of its ingredient ids, so recipes are scored
+    in memory without joining IngredientAmount.
+    """
+
+    def __init__(self, rows):
+        self.recipes = {}
+        ingredients = defaultdict(list)
+        for ingredient_id, group in groupby(rows, key=itemgetter(0)):
+            recipe_ids = array('I', map(itemgetter(1), group))
+            self.recipes[ingredient_id] = recipe_ids
+            for recipe_id in recipe_ids:
+                ingredients[recipe_id].append(ingredient_id)
+        self.ingredients = {
+            recipe_id: array('I', ingredient_ids)
+            for recipe_id, ingredient_ids in ingredients.items()}
+
+    def update(self, recipe_ids, rows):
+        """Replace the ingredients of the recipes with rows of
+        (ingredient id, recipe id), recipes without rows are dropped.
+
+        Changed arrays are replaced rather than modified, so a match
+        running meanwhile in another thread never sees one half-written.
+        """
+        removed = defaultdict(list)
+        for recipe_id in recipe_ids:
+            for ingredient_id in self.ingredients.get(recipe_id, ()):
+                removed[ingredient_id].append(recipe_id)
+        added = defaultdict(list)
+        ingredients = defaultdict(list)
+        for ingredient_id, recipe_id in rows:
+            added[ingredient_id].append(recipe_id)
+            ingredients[recipe_id].append(ingredient_id)
+        for recipe_id, ingredient_ids in ingredients.items():
+            self.ingredients[recipe_id] = array('I', ingredient_ids)
+        for ingredient_id in removed.keys() | added.keys():
+            postings = array('I', self.recipes.get(ingredient_id, ()))
+            for recipe_id in removed[ingredient_id]:
+                del postings[bisect_left(postings, recipe_id)]
+            for recipe_id in added[ingredient_id]:
+                insort(postings, recipe_id)
+            if postings:
+                self.recipes[ingredient_id] = postings
+            else:
+                self.recipes.pop(ingredient_id, None)
+        for recipe_id in set(recipe_ids) - ingredients.keys():
+            self.ingredients.pop(recipe_id, None)
+
+    def match(self, ingredient_ids):
+        """Return (recipe id, matched, missing) of recipes using any of
+        the ingredients, best covered first.
+
+        Recipes are ranked by the share of their ingredients found in
+        the given ones, then by the number of missing ingredients.
+        """
+        matched = Counter(chain.from_iterable(
+            self.recipes.get(pk, ()) for pk in set(ingredient_ids)))
+        results = [
+            (recipe_id, count, len(self.ingredients[recipe_id]) - count)
+            for recipe_id, count in matched.items()]
+        results.sort(key=lambda result: (
+            -result[1] / (result[1] + result[2]), result[2], -result[0]))
+        return results
+
+
+def update_recipes(index, recipe_ids):
+    index.update(recipe_ids, IngredientAmount.objects.filter(
+        recipe_id__in=recipe_ids).values_list('ingredient_id', 'recipe_id'))
+
+
+recipe_ingredient_index = LazyIndex(
+    'recipe_ingredients', lambda: RecipeIngredientIndex(
+        IngredientAmount.objects.order_by(
+            'ingredient_id', 'recipe_id').values_list(
+            'ingredient_id', 'recipe_id').iterator(chunk_size=10000)),
+    update_recipes)
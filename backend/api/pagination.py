@@ -1,5 +1,171 @@
+import base64
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db import connection
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """Row count estimated by the Postgres planner, exact elsewhere."""
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN (FORMAT JSON) ' + sql, params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]['Plan']['Plan Rows']
+
+
+def keyset_filter(ordering, values, forward):
+    """Condition selecting the rows after the values in the ordering.
+
+    For (-pub_date, -id) it is pub_date <= p AND (pub_date < p OR
+    id < i), the leading range lets the database use the index.
+    """
+    first, descending = ordering[0]
+    condition = Q(**{
+        f'{first}__{"lte" if descending == forward else "gte"}': values[0]})
+    after = Q()
+    for position, (name, descending) in enumerate(ordering):
+        lookup = 'lt' if descending == forward else 'gt'
+        after |= Q(**{f'{name}__{lookup}': values[position]}, **{
+            previous: values[index]
+            for index, (previous, _) in enumerate(ordering[:position])})
+    return condition & after
 
 
 class LimitPageNumberPagination(PageNumberPagination):
+    """Page number pagination with an opt-in keyset mode.
+
+    A view with keyset_ordering, a tuple of unique together fields, is
+    paginated by cursor when the request has the cursor parameter. The
+    cursor holds the ordering values of the last row, so deep pages
+    cost as much as the first one and there is no COUNT(*): count is
+    null unless count=approx or count=exact is requested. The response
+    keeps the count, next, previous and results keys.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def get_keyset_ordering(self, queryset, request, view):
+        """Return the keyset ordering if the page is built by cursor."""
+        ordering = getattr(view, 'keyset_ordering', None)
+        if (self.cursor_query_param not in request.query_params
+                or not ordering or not isinstance(queryset, QuerySet)
+                or queryset.query.order_by):
+            return None
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = False
+        ordering = self.get_keyset_ordering(queryset, request, view)
+        if ordering is None:
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_mode = True
+        self.request = request
+        self.ordering = [(name.lstrip('-'), name.startswith('-'))
+                         for name in ordering]
+        self.count = self.get_count(queryset, request)
+        forward, values = self.decode_cursor(queryset, request)
+        size = self.get_page_size(request)
+        if values is not None:
+            queryset = queryset.filter(
+                keyset_filter(self.ordering, values, forward))
+        rows = list(queryset.order_by(*(
+            f'{"-" if descending == forward else ""}{name}'
+            for name, descending in self.ordering))[:size + 1])
+        has_more = len(rows) > size
+        rows = rows[:size]
+        if not forward:
+            rows.reverse()
+        has_next = has_more if forward else values is not None
+        has_previous = values is not None if forward else has_more
+        self.next_cursor = self.encode_cursor(
+            True, rows[-1]) if rows and has_next else None
+        self.previous_cursor = self.encode_cursor(
+            False, rows[0]) if rows and has_previous else None
+        return rows
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Build a page number page with the async ORM.
+
+        Cursor pages are built by paginate_queryset in a worker thread.
+        """
+        if self.get_keyset_ordering(queryset, request, view) is not None:
+            return await sync_to_async(self.paginate_queryset)(
+                queryset, request, view)
+        self.cursor_mode = False
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        self.page.object_list = [
+            obj async for obj in self.page.object_list]
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        self.request = request
+        return list(self.page)
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'approx':
+            return estimate_count(queryset)
+        return None
+
+    def decode_cursor(self, queryset, request):
+        """Return the direction and the ordering values of the cursor."""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return True, None
+        try:
+            forward, *raw = json.loads(base64.urlsafe_b64decode(
+                token.encode()).decode())
+            opts = queryset.model._meta
+            values = [opts.get_field(name).to_python(value)
+                      for (name, _), value in zip(self.ordering, raw)]
+        except (TypeError, ValueError, UnicodeDecodeError, IndexError,
+                AttributeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(values) != len(self.ordering) or None in values:
+            raise NotFound(self.invalid_cursor_message)
+        return bool(forward), values
+
+    def encode_cursor(self, forward, row):
+        values = [forward] + [getattr(row, name) for name, _ in self.ordering]
+        # str() keeps the microseconds of datetimes, isoformat in
+        # DjangoJSONEncoder would cut them to milliseconds.
+        token = base64.urlsafe_b64encode(json.dumps(
+            values, default=str).encode()).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'count': self.count,
+            'next': self.next_cursor,
+            'previous': self.previous_cursor,
+            'results': data,
+        })
@@ -0,0 +1,31 @@
+from api.cache import LazyIndex
+from cookbook.models import Tag
+
+
+class TagRegistry:
+    """Every tag in its API form, looked up by id or slug.
+
+    Tags are few and rarely change, so every worker keeps them all and
+    the tag endpoints, the recipe filter and nested recipe tags need no
+    query.
+    """
+
+    def __init__(self, tags):
+        self.tags = list(tags)
+        self.by_id = {tag['id']: tag for tag in self.tags}
+        self.ids_by_slug = {tag['slug']: tag['id'] for tag in self.tags}
+        self.positions = {tag['id']: position
+                          for position, tag in enumerate(self.tags)}
+
+    def choices(self):
+        return [(tag['slug'], tag['name']) for tag in self.tags]
+
+    def serialize(self, ids):
+        """Tags with the given ids, in the order of the tag list."""
+        return [self.by_id[pk] for pk in sorted(
+            (pk for pk in set(ids) if pk in self.by_id),
+            key=self.positions.__getitem__)]
+
+
+tag_registry = LazyIndex('tags', lambda: TagRegistry(
+    Tag.objects.values('id', 'name', 'color', 'slug')))
@@ -0,0 +1,83 @@
+from django.db.models import Value
+
+from cookbook.models import Favorite, ShoppingCart
+from users.models import Follow
+
+REQUEST_ATTRIBUTE = 'user_relations'
+# Set name: (model linking the user, column holding the related id).
+RELATIONS = {
+    'favorite_ids': (Favorite, 'recipe_id'),
+    'cart_ids': (ShoppingCart, 'recipe_id'),
+    'followed_ids': (Follow, 'author_id'),
+}
+
+
+class UserRelations:
+    """Favorites, cart and follows of the requesting user as id sets.
+
+    A set is loaded the first time it is asked for, so flags of a whole
+    page are set lookups. Sets needed together are loaded with a single
+    UNION ALL query. Anonymous users have no relations and cost no
+    queries.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.sets = {}
+
+    def get_missing_query(self, names):
+        """Mark the missing sets as loaded and return the query filling
+        them, None if there is nothing to load.
+        """
+        missing = [name for name in names if name not in self.sets]
+        for name in missing:
+            self.sets[name] = set()
+        if not missing or not self.user.is_authenticated:
+            return None
+        querysets = [
+            RELATIONS[name][0].objects.filter(user=self.user).annotate(
+                kind=Value(name)).values_list(
+                'kind', RELATIONS[name][1]).order_by()
+            for name in missing]
+        return querysets[0].union(*querysets[1:], all=True)
+
+    def preload(self, *names):
+        for name, pk in self.get_missing_query(names) or ():
+            self.sets[name].add(pk)
+
+    async def apreload(self, *names):
+        queryset = self.get_missing_query(names)
+        if queryset is not None:
+            async for name, pk in queryset:
+                self.sets[name].add(pk)
+
+    def get(self, name):
+        self.preload(name)
+        return self.sets[name]
+
+    @property
+    def favorite_ids(self):
+        return self.get('favorite_ids')
+
+    @property
+    def cart_ids(self):
+        return self.get('cart_ids')
+
+    @property
+    def followed_ids(self):
+        return self.get('followed_ids')
+
+
+def get_user_relations(request, *preload):
+    """Return the relations of the request user, shared by serializers.
+
+    They are kept on the underlying HttpRequest, so nested serializers
+    and serializers created in views of the same request share them.
+    """
+    request = getattr(request, '_request', request)
+    relations = getattr(request, REQUEST_ATTRIBUTE, None)
+    if relations is None or relations.user != request.user:
+        relations = UserRelations(request.user)
+        setattr(request, REQUEST_ATTRIBUTE, relations)
+    relations.preload(*preload)
+    return relations
@@ -0,0 +1,71 @@
+from decimal import Decimal
+
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def has_non_finite(data):
+    """Whether data holds NaN or an infinity, which orjson writes as null.
+
+    Strings, integers and None, most of any payload, are skipped first.
+    """
+    stack = [data.values() if isinstance(data, dict) else [data]]
+    while stack:
+        for value in stack.pop():
+            cls = value.__class__
+            if cls is str or cls is int or cls is bool or value is None:
+                continue
+            if isinstance(value, dict):
+                stack.append(value.values())
+            elif isinstance(value, (list, tuple)):
+                stack.append(value)
+            elif (isinstance(value, float) and value - value
+                  or isinstance(value, Decimal) and not value.is_finite()):
+                return True
+    return False
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer serializing with orjson when it is installed.
+
+    Strings, integers and datetimes are written as JSONRenderer writes
+    them, values orjson does not know and datetimes go through its
+    encoder. Floats keep their value but not always their spelling:
+    orjson writes 1e20 and 1e-7 for 1e+20 and 1e-07. Indented,
+    ASCII-only or non-compact output, data orjson refuses and data
+    holding NaN or infinities fall back to the standard library, which
+    rejects them under STRICT_JSON.
+    """
+
+    def can_use_orjson(self, accepted_media_type, renderer_context):
+        return (orjson is not None and not self.ensure_ascii
+                and self.compact and self.get_indent(
+                    accepted_media_type, renderer_context or {}) is None)
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or not self.can_use_orjson(
+                accepted_media_type, renderer_context):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        if b'null' in content and has_non_finite(data):
+            return super().render(
+                data, accepted_media_type, renderer_context)
+        # Escaped like JSONRenderer does, to stay a strict JavaScript
+        # subset.
+        return content.replace(
+            '\u2028'.encode(), b'\\u2028').replace(
+            '\u2029'.encode(), b'\\u2029')
@@ -1,16 +1,97 @@
-from django.db.models import F
+import hashlib
+from functools import partial
+
+from django.db import transaction
+from django.utils.functional import cached_property
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers, status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
 
-from cookbook.models import Ingredient, IngredientAmount, Recipe, Tag
+from api.batch import BATCH_LIMIT
+from api.cache import bump_generation
+from api.images import variant_names
+from api.matching import recipe_ingredient_index
+from api.registry import tag_registry
+from api.relations import get_user_relations
+from api.sparse import SparseFieldsMixin, is_selected
+from cookbook.carts import change_recipe_amounts
+from cookbook.models import CartItem, Ingredient, IngredientAmount, Recipe, Tag
+from cookbook.search import update_search_index
 from users.models import Follow, User
 
 
+def in_bulk_or_error(model, ids, message):
+    """Fetch objects by ids in one query, in the order of the ids.
+
+    Missing ids are listed in the validation error built from message.
+    """
+    objects = model.objects.in_bulk(ids)
+    missing = [str(pk) for pk in ids if pk not in objects]
+    if missing:
+        raise serializers.ValidationError(message.format(', '.join(missing)))
+    return [objects[pk] for pk in ids]
+
+
+def get_recipes_limit(request):
+    """Return the recipes_limit query parameter as an int or None."""
+    try:
+        limit = int(request.query_params['recipes_limit'])
+    except (KeyError, ValueError):
+        return None
+    return limit if limit >= 0 else None
+
+
+class HashedBase64ImageField(Base64ImageField):
+    """Base64 image stored under a hash of its content.
+
+    An upload identical to an already stored image reuses the stored
+    file instead of writing a copy.
+    """
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()[:32]
+
+    def to_internal_value(self, base64_data):
+        file = super().to_internal_value(base64_data)
+        if file is None:
+            return file
+        model_field = self.parent.Meta.model._meta.get_field(self.source)
+        name = model_field.generate_filename(None, file.name)
+        if model_field.storage.exists(name):
+            return name
+        return file
+
+
+class ImageVariantsField(serializers.Field):
+    """URLs of the resized copies of a recipe image.
+
+    Empty until the background workers have generated the variants of
+    the current image.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        image = recipe.image
+        if not image or recipe.image_variants != variant_names(image.name):
+            return {}
+        request = self.context.get('request')
+        urls = {variant: image.storage.url(name)
+                for variant, name in recipe.image_variants.items()}
+        if request is None:
+            return urls
+        return {variant: request.build_absolute_uri(url)
+                for variant, url in urls.items()}
+
+
 class RecipeShortSerializer(serializers.ModelSerializer):
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -18,6 +99,7 @@ class RecipeShortSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time', )
         read_only_fields = fields
 
@@ -29,15 +111,14 @@ class CustomUserCreateSerializer(UserCreateSerializer):
                   + (User.USERNAME_FIELD, 'password', ))
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SparseFieldsMixin, UserSerializer):
     is_subscribed = SerializerMethodField(read_only=True)
 
     def get_is_subscribed(self, user_obj):
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and Follow.objects.filter(user=user, author=user_obj).exists()
-        )
+        if hasattr(user_obj, 'is_subscribed'):
+            return user_obj.is_subscribed
+        return user_obj.id in get_user_relations(
+            self.context['request']).followed_ids
 
     class Meta:
         model = User
@@ -50,7 +131,7 @@ class CustomUserSerializer(UserSerializer):
             'is_subscribed', )
 
 
-class FollowSerializer(CustomUserCreateSerializer):
+class FollowSerializer(SparseFieldsMixin, CustomUserCreateSerializer):
     recipes_count = SerializerMethodField(read_only=True)
     recipes = SerializerMethodField(read_only=True)
     is_subscribed = serializers.SerializerMethodField()
@@ -62,11 +143,10 @@ class FollowSerializer(CustomUserCreateSerializer):
         read_only_fields = ('username', 'email',)
 
     def get_is_subscribed(self, user_obj):
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and Follow.objects.filter(user=user, author=user_obj).exists()
-        )
+        if hasattr(user_obj, 'is_subscribed'):
+            return user_obj.is_subscribed
+        return user_obj.id in get_user_relations(
+            self.context['request']).followed_ids
 
     def validate(self, data):
         user = self.context['request'].user
@@ -82,14 +162,15 @@ class FollowSerializer(CustomUserCreateSerializer):
         return data
 
     def get_recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
+        if hasattr(obj, 'recent_recipes'):
+            return RecipeShortSerializer(obj.recent_recipes, many=True).data
+        limit = get_recipes_limit(self.context['request'])
         queryset = Recipe.objects.filter(author=obj)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if limit is not None:
+            queryset = queryset[:limit]
         return RecipeShortSerializer(queryset, many=True).data
 
 
@@ -106,10 +187,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
-    id = serializers.SlugRelatedField(
-        source='ingredient',
-        slug_field='id',
-        queryset=Ingredient.objects.all(), )
+    id = serializers.IntegerField(source='ingredient')
     name = serializers.SlugRelatedField(
         source='ingredient',
         slug_field='name',
@@ -124,47 +202,95 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
         exclude = ('recipe', 'ingredient', )
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class BatchSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BATCH_LIMIT, )
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='ingredient_id')
+    name = serializers.CharField(source='ingredient.name')
+    measurement_unit = serializers.CharField(
+        source='ingredient.measurement_unit')
+
+    class Meta:
+        model = CartItem
+        fields = ('id', 'name', 'measurement_unit', 'amount', )
+
+
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    # Relation sets of the request user read by the fields.
+    relation_fields = {
+        'is_favorited': 'favorite_ids',
+        'is_in_shopping_cart': 'cart_ids',
+        'author': 'followed_ids', }
     author = CustomUserSerializer(read_only=True, )
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     ingredients = serializers.SerializerMethodField()
-    tags = TagSerializer(many=True, read_only=True)
+    tags = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        exclude = ('pub_date', 'search_vector', 'favorites_count', )
+
+    def to_representation(self, recipe):
+        # Loaded before the nested author asks for the followed ids alone.
+        self.get_relations()
+        return super().to_representation(recipe)
+
+    @classmethod
+    def get_relation_names(cls, request):
+        return [name for field, name in cls.relation_fields.items()
+                if is_selected(request, field)]
+
+    @cached_property
+    def relation_names(self):
+        return self.get_relation_names(self.context['request'])
+
+    def get_relations(self):
+        return get_user_relations(
+            self.context['request'], *self.relation_names)
 
     def get_is_favorited(self, recipe):
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and user.favorites.filter(recipe=recipe).exists())
+        return recipe.id in self.get_relations().favorite_ids
 
     def get_is_in_shopping_cart(self, recipe):
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and (user.carts.filter(recipe=recipe).exists()))
+        return recipe.id in self.get_relations().cart_ids
+
+    def get_tags(self, recipe):
+        if 'tags' not in self.context:
+            self.context['tags'] = tag_registry.get()
+        if not hasattr(recipe, 'tag_ids'):
+            ids = recipe.tags.values_list('id', flat=True)
+        elif recipe.tag_ids:
+            ids = map(int, recipe.tag_ids.split(','))
+        else:
+            ids = ()
+        return self.context['tags'].serialize(ids)
 
     def get_ingredients(self, recipe):
-        return recipe.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredientamount__amount')
-        )
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            }
+            for item in recipe.ingredient_list.all()
+        ]
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = IngredientAmountSerializer(
         source='ingredientamount_set',
         many=True, )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all(), )
-    image = Base64ImageField()
+    tags = serializers.ListField(child=serializers.IntegerField())
+    image = HashedBase64ImageField()
     author = CustomUserSerializer(read_only=True)
 
     class Meta:
@@ -180,6 +306,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             'cooking_time', )
 
     def to_representation(self, recipe):
+        recipe = Recipe.objects.with_related().get(pk=recipe.pk)
         return RecipeReadSerializer(recipe, context=self.context).data
 
     def create_ingredient_amounts(self, recipe, ingredientamount_set):
@@ -190,44 +317,103 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 amount=item['amount'], )
              for item in ingredientamount_set]
         )
+        recipe_ingredient_index.changed(recipe.id)
 
     def create(self, validated_data):
         ingredientamount_set = validated_data.pop('ingredientamount_set')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(**validated_data, )
-        recipe.tags.set(tags)
-        self.create_ingredient_amounts(recipe, ingredientamount_set)
+        with transaction.atomic():
+            recipe = Recipe.objects.create(**validated_data, )
+            recipe.tags.set(tags)
+            self.create_ingredient_amounts(recipe, ingredientamount_set)
         return recipe
 
+    def update_ingredient_amounts(self, recipe, ingredientamount_set):
+        """Insert, update and delete only the changed ingredient rows.
+
+        Unchanged rows keep their primary keys. Returns True if any row
+        was inserted or updated, as bulk operations send no signals. For
+        the same reason the carts holding the recipe are updated here.
+        """
+        amounts = {item['ingredient'].id: item['amount']
+                   for item in ingredientamount_set}
+        existing = {row.ingredient_id: row
+                    for row in recipe.ingredient_list.all()}
+        removed = [row.id for ingredient_id, row in existing.items()
+                   if ingredient_id not in amounts]
+        changed = [row for ingredient_id, row in existing.items()
+                   if amounts.get(ingredient_id, row.amount) != row.amount]
+        deltas = dict(amounts)
+        for ingredient_id, row in existing.items():
+            deltas[ingredient_id] = deltas.get(ingredient_id, 0) - row.amount
+        for row in changed:
+            row.amount = amounts[row.ingredient_id]
+        added = [IngredientAmount(recipe=recipe,
+                                  ingredient_id=ingredient_id,
+                                  amount=amount)
+                 for ingredient_id, amount in amounts.items()
+                 if ingredient_id not in existing]
+        if removed:
+            IngredientAmount.objects.filter(id__in=removed).delete()
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ('amount',))
+        if added:
+            IngredientAmount.objects.bulk_create(added)
+        change_recipe_amounts(recipe.id, deltas)
+        return bool(changed or added)
+
     def update(self, recipe, validated_data):
-        if 'ingredientamount_set' in validated_data:
-            ingredientamount_set = validated_data.pop('ingredientamount_set')
-            if ingredientamount_set:
-                recipe.ingredients.clear()
-            self.create_ingredient_amounts(
-                recipe, ingredientamount_set
-            )
-        return super().update(recipe, validated_data)
+        """Write only the fields, tags and ingredient rows that changed."""
+        ingredientamount_set = validated_data.pop(
+            'ingredientamount_set', None)
+        tags = validated_data.pop('tags', None)
+        changed_fields = [name for name, value in validated_data.items()
+                          if getattr(recipe, name) != value]
+        with transaction.atomic():
+            for name in changed_fields:
+                setattr(recipe, name, validated_data[name])
+            if changed_fields:
+                recipe.save(update_fields=changed_fields)
+            if tags is not None:
+                recipe.tags.set(tags)
+            if (ingredientamount_set is not None
+                    and self.update_ingredient_amounts(
+                        recipe, ingredientamount_set)):
+                transaction.on_commit(partial(bump_generation, 'recipes'))
+                recipe_ingredient_index.changed(recipe.id)
+                transaction.on_commit(
+                    partial(update_search_index, [recipe.pk]))
+        return recipe
 
-    def validate(self, attrs):
-        if len(attrs['tags']) == 0:
+    def validate_tags(self, tags):
+        if not tags:
             raise serializers.ValidationError('Должен быть выбран'
                                               ' хотя бы один тег.')
-        if len(attrs['tags']) != len(set(attrs['tags'])):
+        if len(tags) != len(set(tags)):
             raise serializers.ValidationError('Теги должны быть уникальны.')
-        if len(attrs['ingredientamount_set']) == 0:
+        by_id = tag_registry.get().by_id
+        missing = [str(pk) for pk in tags if pk not in by_id]
+        if missing:
+            raise serializers.ValidationError(
+                f'Теги не найдены: {", ".join(missing)}.')
+        return tags
+
+    def validate_ingredients(self, ingredients):
+        if not ingredients:
             raise serializers.ValidationError(
                 'Должен быть выбран хотя бы один ингредиент.'
             )
-        ingredients = attrs['ingredientamount_set']
-        if (len(ingredients)
-                != len(set(obj['ingredient'] for obj in ingredients))):
+        ids = [item['ingredient'] for item in ingredients]
+        if len(ids) != len(set(ids)):
             raise serializers.ValidationError(
                 'Такой ингридиент уже используется')
-        if any(obj['amount'] <= 0 for obj in ingredients):
-            raise serializers.ValidationError(
-                'Количество игредиента должно быть больше нуля.')
-        if attrs['cooking_time'] <= 0:
+        for item, ingredient in zip(ingredients, in_bulk_or_error(
+                Ingredient, ids, 'Ингредиенты не найдены: {}.')):
+            item['ingredient'] = ingredient
+        return ingredients
+
+    def validate(self, attrs):
+        if attrs.get('cooking_time', 1) <= 0:
             raise serializers.ValidationError(
                 'Время приготовления должно быть больше нуля.')
         return super().validate(attrs)
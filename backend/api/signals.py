@@ -0,0 +1,57 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.autocomplete import ingredient_index
+from api.cache import bump_generation_on_commit
+from api.images import schedule_variants, variant_names
+from api.matching import recipe_ingredient_index
+from cookbook.models import Ingredient, IngredientAmount, Recipe, Tag
+from users.models import User
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(**kwargs):
+    ingredient_index.invalidate()
+    bump_generation_on_commit('recipes')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_changed(**kwargs):
+    bump_generation_on_commit('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(instance, raw=False, **kwargs):
+    image = instance.image
+    if raw or not image or instance.image_variants == variant_names(
+            image.name):
+        return
+    transaction.on_commit(partial(schedule_variants, image.name))
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_changed(instance, **kwargs):
+    recipe_ingredient_index.changed(instance.recipe_id)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(**kwargs):
+    bump_generation_on_commit('recipes', 'tags')
+
+
+@receiver((post_save, post_delete), sender=User)
+def user_changed(update_fields=None, **kwargs):
+    if update_fields and set(update_fields) == {'last_login'}:
+        return
+    bump_generation_on_commit('recipes', 'tokens')
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(**kwargs):
+    bump_generation_on_commit('tokens')
@@ -0,0 +1,41 @@
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_names(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def is_selected(request, name):
+    """Whether the field is rendered under ?fields= and ?omit=.
+
+    fields keeps only the listed fields, omit drops the listed ones.
+    Both take comma separated names and apply to reads only.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return True
+    fields = parse_names(request.query_params.get(FIELDS_PARAM, ''))
+    return ((not fields or name in fields) and name not in parse_names(
+        request.query_params.get(OMIT_PARAM, '')))
+
+
+class SparseFieldsMixin:
+    """Render only the fields selected with ?fields= and ?omit=.
+
+    Applies to the outermost serializer, or to the items of an outermost
+    list. Nested serializers keep all their fields.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, ListSerializer):
+            parent = getattr(parent, 'parent', None)
+        if parent is not None:
+            return fields
+        request = self.context.get('request')
+        return {name: field for name, field in fields.items()
+                if is_selected(request, name)}
@@ -0,0 +1,85 @@
+import base64
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import Count
+from django.test.utils import override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from users.models import User
+
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tests', },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test-tokens', },
+}
+
+
+def encode_image(size=(64, 64)):
+    """Return a small PNG as a data URL accepted by Base64ImageField."""
+    file = BytesIO()
+    Image.new('RGB', size, '#E26C2D').save(file, 'PNG')
+    return ('data:image/png;base64,'
+            + base64.b64encode(file.getvalue()).decode())
+
+
+@pytest.fixture(scope='session')
+def django_db_setup(django_db_setup, django_db_blocker, pytestconfig):
+    """Seed the test database once with seed_synthetic."""
+    with django_db_blocker.unblock(), override_settings(CACHES=TEST_CACHES):
+        call_command(
+            'seed_synthetic', stdout=StringIO(),
+            users=pytestconfig.getoption('seed_users'),
+            recipes=pytestconfig.getoption('seed_recipes'))
+
+
+@pytest.fixture(autouse=True)
+def test_cache(settings):
+    settings.CACHES = TEST_CACHES
+    cache.clear()
+
+
+@pytest.fixture
+def user(db):
+    """The user with the biggest cart, who also has favorites and
+    follows."""
+    return User.objects.annotate(
+        cart_size=Count('carts')).order_by('-cart_size', 'id').first()
+
+
+@pytest.fixture
+def api_client(db):
+    return APIClient()
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def recipe_payload(settings, tmp_path):
+    """Build the body of a recipe create or update request."""
+    settings.MEDIA_ROOT = str(tmp_path)
+    image = encode_image()
+
+    def make(ingredients, tags, amount=100, **fields):
+        return {
+            'ingredients': [{'id': ingredient.id, 'amount': amount}
+                            for ingredient in ingredients],
+            'tags': [tag.id for tag in tags],
+            'image': image,
+            'name': 'Тестовый рецепт',
+            'text': 'Описание тестового рецепта.',
+            'cooking_time': 30,
+            **fields, }
+
+    return make
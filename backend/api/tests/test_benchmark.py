@@ -0,0 +1,154 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+import pytest
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from cookbook.models import Ingredient, Recipe, Tag
+
+RECIPE_INGREDIENTS = 20
+
+# Maximum number of queries per request. They must not depend on the data
+# size nor on the number of ingredients and tags of a written recipe.
+QUERY_BUDGETS = {
+    'recipes_list': 6,
+    'recipes_list_cards': 3,
+    'recipes_detail': 5,
+    'recipes_filter': 6,
+    'recipes_search': 6,
+    'recipes_by_ingredients': 4,
+    'download_shopping_cart': 3,
+    'shopping_cart_summary': 3,
+    'shopping_cart_batch': 4,
+    'subscriptions': 5,
+    'ingredient_search': 2,
+    'recipe_create': 14,
+    'recipe_update': 14,
+}
+
+pytestmark = pytest.mark.benchmark
+
+
+@pytest.fixture(scope='session')
+def baseline(pytestconfig):
+    path = pytestconfig.getoption('benchmark_baseline')
+    if not path:
+        return {}
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError) as error:
+        raise pytest.UsageError(f'Невозможно прочитать {path}: {error}')
+
+
+@pytest.fixture
+def scenarios(user, user_client, recipe_payload):
+    """Requests keyed by scenario name, as (prepare, request).
+
+    prepare runs before the request and is not measured, its result is
+    passed to the request.
+    """
+    client = user_client
+    recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+    tag = Tag.objects.order_by('id').first()
+    ingredients = list(Ingredient.objects.order_by('id')[:RECIPE_INGREDIENTS])
+    payload = recipe_payload(ingredients, [tag], name='Рецепт для замеров')
+    changed = dict(payload, name='Изменённый рецепт для замеров')
+    changed['ingredients'] = payload['ingredients'][:-1] + [
+        {'id': ingredients[-1].id, 'amount': 200}]
+    search = ingredients[0].name[:2]
+    # A week of dinners added to the cart at once.
+    week = list(Recipe.objects.exclude(in_carts__user=user).order_by(
+        'id').values_list('id', flat=True)[:7])
+    return {
+        'recipes_list': (None, lambda _: client.get('/api/recipes/')),
+        'recipes_list_cards': (None, lambda _: client.get(
+            '/api/recipes/',
+            {'fields': 'id,name,image,image_variants,cooking_time'})),
+        'recipes_detail': (None, lambda _: client.get(
+            f'/api/recipes/{recipe.id}/')),
+        'recipes_filter': (None, lambda _: client.get(
+            f'/api/recipes/?tags={tag.slug}&is_favorited=1')),
+        'recipes_search': (None, lambda _: client.get(
+            '/api/recipes/', {'search': search})),
+        'recipes_by_ingredients': (None, lambda _: client.get(
+            '/api/recipes/by_ingredients/', {'ingredients': ','.join(
+                str(ingredient.id) for ingredient in ingredients[:8])})),
+        'download_shopping_cart': (None, lambda _: client.get(
+            '/api/recipes/download_shopping_cart/')),
+        'shopping_cart_summary': (None, lambda _: client.get(
+            '/api/recipes/shopping_cart_summary/')),
+        'shopping_cart_batch': (None, lambda _: client.post(
+            '/api/recipes/shopping_cart/', {'ids': week}, format='json')),
+        'subscriptions': (None, lambda _: client.get(
+            '/api/users/subscriptions/?recipes_limit=3')),
+        'ingredient_search': (None, lambda _: client.get(
+            '/api/ingredients/', {'name': search})),
+        'recipe_create': (None, lambda _: client.post(
+            '/api/recipes/', payload, format='json')),
+        'recipe_update': (
+            lambda: client.post(
+                '/api/recipes/', payload, format='json').data['id'],
+            lambda pk: client.patch(
+                f'/api/recipes/{pk}/', changed, format='json')),
+    }
+
+
+def run(prepare, request, trace=False):
+    """Run a request once in a transaction that is rolled back.
+
+    Writes do not change the data measured by the next runs. Queries
+    and allocations of prepare, such as creating the recipe to be
+    updated, are not measured.
+    """
+    with transaction.atomic():
+        argument = prepare() if prepare else None
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        with CaptureQueriesContext(connection) as context:
+            response = request(argument)
+            if response.streaming:
+                b''.join(response.streaming_content)
+        duration = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+        tracemalloc.stop()
+        transaction.set_rollback(True)
+    assert response.status_code < 400, response.content[:200]
+    return duration * 1000, len(context.captured_queries), peak
+
+
+def measure(prepare, request, repeat):
+    """Return the median latency, query count and peak memory.
+
+    The first run warms up caches and in-memory indexes. Memory is
+    traced in a separate run, as tracing slows the code down.
+    """
+    run(prepare, request)
+    runs = [run(prepare, request) for _ in range(repeat)]
+    peak = run(prepare, request, trace=True)[2]
+    return {
+        'ms': round(statistics.median(run[0] for run in runs), 2),
+        'queries': max(run[1] for run in runs),
+        'peak_kib': round(peak / 1024, 1), }
+
+
+@pytest.mark.parametrize('name', QUERY_BUDGETS)
+def test_benchmark(name, scenarios, baseline, benchmark_results,
+                   pytestconfig):
+    result = measure(
+        *scenarios[name], pytestconfig.getoption('benchmark_repeat'))
+    benchmark_results[name] = result
+    assert result['queries'] <= QUERY_BUDGETS[name], (
+        f'{result["queries"]} запросов при бюджете {QUERY_BUDGETS[name]}.')
+    if name not in baseline:
+        return
+    before = baseline[name]
+    assert result['queries'] <= before['queries'], (
+        f'Запросов стало {result["queries"]}, было {before["queries"]}.')
+    tolerance = pytestconfig.getoption('benchmark_tolerance')
+    assert result['ms'] <= before['ms'] * (1 + tolerance), (
+        f'{result["ms"]} мс, было {before["ms"]} мс.')
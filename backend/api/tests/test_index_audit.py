@@ -0,0 +1,38 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from api.management.commands.index_audit import Command
+from cookbook.models import Recipe
+
+
+def test_index_audit_passes_on_seeded_data(db):
+    stdout = StringIO()
+    call_command('index_audit', stdout=stdout)
+    assert 'последовательное сканирование' not in stdout.getvalue()
+
+
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='Планы SQLite.')
+@pytest.mark.parametrize('plan, bounded, scans', (
+    ('SCAN cookbook_recipe', True, ['cookbook_recipe']),
+    ('SCAN cookbook_recipe USING INDEX recipe_pub_date_id', False,
+     ['cookbook_recipe']),
+    ('SCAN cookbook_recipe USING INDEX recipe_pub_date_id', True, []),
+    ('SEARCH cookbook_recipe USING INDEX recipe_author_id (author_id=?)',
+     False, []),
+    ('SCAN cookbook_tag', False, []),
+))
+def test_find_scans(db, plan, bounded, scans):
+    assert Command().find_scans(plan, bounded) == scans
+
+
+def test_is_bounded(db):
+    command = Command()
+    recipes = Recipe.objects.all()
+    assert command.is_bounded(recipes.order_by('-pub_date')[:6])
+    assert not command.is_bounded(recipes.order_by('-pub_date'))
+    assert command.is_bounded(recipes[:6])
+    assert not command.is_bounded(recipes.order_by()[:6])
@@ -0,0 +1,42 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from api import instrumentation
+
+ROUTE = 'GET /api/recipes/'
+# A request recorded by another worker, slower than any test request.
+OTHER_SAMPLE = (3, 10.0, 20.0, 5.0, 60000.0, 1000)
+
+
+@pytest.fixture
+def admin_client(settings, user, monkeypatch):
+    """Client of an admin with instrumentation on and no samples yet."""
+    settings.QUERY_INSTRUMENTATION = True
+    monkeypatch.setattr(instrumentation, 'route_stats', {})
+    monkeypatch.setitem(instrumentation.published, 'at', None)
+    user.is_staff = True
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def test_report_merges_samples_of_all_workers(admin_client):
+    admin_client.get('/api/recipes/')
+    worker = 'other-host:1'
+    cache.set(instrumentation.WORKER_STATS_KEY.format(worker), {
+        'routes': {ROUTE: [OTHER_SAMPLE]},
+        'token_cache': {'hits': 2, 'misses': 1}, })
+    cache.set(instrumentation.WORKERS_KEY, cache.get(
+        instrumentation.WORKERS_KEY) | {worker})
+    report = admin_client.get('/api/instrumentation/').data
+    assert report[ROUTE]['requests'] == 2
+    assert report[ROUTE]['total_ms']['p99'] == 60000.0
+    assert report['token_cache']['hits'] == 2
+
+
+def test_report_forgets_expired_workers(admin_client):
+    cache.set(instrumentation.WORKERS_KEY, {'stopped-host:1'})
+    admin_client.get('/api/instrumentation/')
+    assert cache.get(instrumentation.WORKERS_KEY) == {
+        instrumentation.get_worker()}
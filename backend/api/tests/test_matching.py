@@ -0,0 +1,55 @@
+import pytest
+
+from api.matching import RecipeIngredientIndex, recipe_ingredient_index
+from cookbook.models import Ingredient, Tag
+
+ROWS = ((1, 10), (1, 11), (2, 10), (2, 12), (3, 11))
+
+
+def build(rows):
+    return RecipeIngredientIndex(sorted(rows))
+
+
+def test_update_matches_rebuild():
+    index = build(ROWS)
+    # Recipe 10 changes ingredients, 11 is deleted and 13 is created.
+    changes = ((1, 10), (3, 10), (2, 13), (4, 13))
+    index.update({10, 11, 13}, changes)
+    rebuilt = build(((2, 12), ) + changes)
+    assert index.recipes == rebuilt.recipes
+    assert index.ingredients == rebuilt.ingredients
+    assert index.match([1, 2, 3, 4]) == rebuilt.match([1, 2, 3, 4])
+
+
+@pytest.fixture
+def by_ingredients(user_client):
+    def get(ingredients):
+        response = user_client.get('/api/recipes/by_ingredients/', {
+            'ingredients': ','.join(
+                str(ingredient.id) for ingredient in ingredients)})
+        assert response.status_code == 200, response.content
+        return [(item['id'], item['missing_count'])
+                for item in response.data['results']]
+
+    return get
+
+
+def test_recipe_writes_update_the_index_in_place(
+        user_client, recipe_payload, by_ingredients, monkeypatch,
+        django_capture_on_commit_callbacks):
+    ingredients = list(Ingredient.objects.order_by('id')[:2])
+    tags = list(Tag.objects.order_by('id')[:1])
+    by_ingredients(ingredients)
+    monkeypatch.setattr(recipe_ingredient_index, 'build', None)
+    with django_capture_on_commit_callbacks(execute=True):
+        pk = user_client.post('/api/recipes/', recipe_payload(
+            ingredients, tags), format='json').data['id']
+    assert by_ingredients(ingredients)[0] == (pk, 0)
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.patch(f'/api/recipes/{pk}/', recipe_payload(
+            ingredients[1:], tags), format='json')
+    assert (pk, 0) in by_ingredients(ingredients[1:])
+    assert pk not in dict(by_ingredients(ingredients[:1]))
+    with django_capture_on_commit_callbacks(execute=True):
+        user_client.delete(f'/api/recipes/{pk}/')
+    assert pk not in dict(by_ingredients(ingredients))
@@ -0,0 +1,65 @@
+import pytest
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from cookbook.models import Ingredient, IngredientAmount, Recipe
+
+PAGE_SIZES = (6, 30)
+EXTRA_INGREDIENTS = 20
+
+
+def warm_up(client):
+    """The first request builds the process-local tag registry."""
+    client.get('/api/recipes/', {'limit': 1})
+
+
+def get_with_queries(client, url, **params):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, params)
+    assert response.status_code == 200, response.content
+    return response, len(context.captured_queries)
+
+
+@pytest.fixture
+def recipes(db):
+    """A recipe with the fewest tags and ingredients and one with the
+    most, the latter given extra ingredients."""
+    ordered = Recipe.objects.annotate(
+        tag_count=Count('tags')).order_by('tag_count', 'id')
+    small, large = ordered.first(), ordered.last()
+    used = large.ingredient_list.values('ingredient')
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=large, ingredient=ingredient, amount=10)
+        for ingredient in Ingredient.objects.exclude(
+            id__in=used)[:EXTRA_INGREDIENTS])
+    return small, large
+
+
+@pytest.mark.parametrize('client_name', ('api_client', 'user_client'))
+def test_recipe_list_queries_do_not_depend_on_page_size(
+        request, client_name):
+    client = request.getfixturevalue(client_name)
+    warm_up(client)
+    counts = []
+    for size in PAGE_SIZES:
+        response, queries = get_with_queries(
+            client, '/api/recipes/', limit=size)
+        assert len(response.data['results']) == size
+        counts.append(queries)
+    assert counts[0] == counts[1]
+
+
+@pytest.mark.parametrize('client_name', ('api_client', 'user_client'))
+def test_recipe_detail_queries_do_not_depend_on_recipe_size(
+        request, client_name, recipes):
+    client = request.getfixturevalue(client_name)
+    warm_up(client)
+    counts = []
+    for recipe in recipes:
+        response, queries = get_with_queries(
+            client, f'/api/recipes/{recipe.id}/')
+        assert len(response.data['ingredients']) == (
+            recipe.ingredient_list.count())
+        counts.append(queries)
+    assert counts[0] == counts[1]
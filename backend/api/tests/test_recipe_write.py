@@ -0,0 +1,86 @@
+import pytest
+from django.db import connection
+from django.db.models import Max
+from django.test.utils import CaptureQueriesContext
+
+from cookbook.models import Ingredient, Tag
+
+INGREDIENT_COUNTS = (1, 40)
+
+
+def send_with_queries(client, method, url, payload):
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, payload, format='json')
+    assert response.status_code < 400, response.content
+    return response, len(context.captured_queries)
+
+
+@pytest.fixture
+def ingredients(db):
+    return list(Ingredient.objects.order_by('id')[:max(
+        INGREDIENT_COUNTS) + 2])
+
+
+@pytest.fixture
+def tags(db):
+    return list(Tag.objects.order_by('id'))
+
+
+@pytest.fixture
+def missing_ids():
+    """Two ids no ingredient or tag has."""
+    start = max(Ingredient.objects.aggregate(last=Max('id'))['last'],
+                Tag.objects.aggregate(last=Max('id'))['last']) + 1
+    return [start, start + 1]
+
+
+def test_recipe_create_queries_do_not_depend_on_ingredients(
+        user_client, recipe_payload, ingredients, tags):
+    user_client.post('/api/recipes/', recipe_payload(
+        ingredients[:1], tags[:1]), format='json')
+    counts = []
+    for count in INGREDIENT_COUNTS:
+        response, queries = send_with_queries(
+            user_client, 'post', '/api/recipes/',
+            recipe_payload(ingredients[:count], tags[:count]))
+        assert len(response.data['ingredients']) == count
+        counts.append(queries)
+    assert counts[0] == counts[1]
+
+
+def test_recipe_update_queries_do_not_depend_on_ingredients(
+        user_client, recipe_payload, ingredients, tags):
+    """Every update replaces the tags and removes, changes and adds
+    ingredient rows."""
+    counts = []
+    for count in INGREDIENT_COUNTS:
+        pk = user_client.post('/api/recipes/', recipe_payload(
+            ingredients[:count + 1], tags[-1:]), format='json').data['id']
+        response, queries = send_with_queries(
+            user_client, 'patch', f'/api/recipes/{pk}/', recipe_payload(
+                ingredients[1:count + 2], tags[:-1][:count], amount=200,
+                name='Изменённый рецепт'))
+        assert len(response.data['ingredients']) == count + 1
+        counts.append(queries)
+    assert counts[0] == counts[1]
+
+
+def test_recipe_create_lists_missing_ingredients(
+        user_client, recipe_payload, ingredients, tags, missing_ids):
+    response = user_client.post('/api/recipes/', recipe_payload(
+        ingredients[:1] + [Ingredient(id=pk) for pk in missing_ids],
+        tags[:1]), format='json')
+    assert response.status_code == 400
+    assert response.data['ingredients'] == [
+        'Ингредиенты не найдены: {}.'.format(
+            ', '.join(map(str, missing_ids)))]
+
+
+def test_recipe_create_lists_missing_tags(
+        user_client, recipe_payload, ingredients, tags, missing_ids):
+    response = user_client.post('/api/recipes/', recipe_payload(
+        ingredients[:1], tags[:1] + [Tag(id=pk) for pk in missing_ids]),
+        format='json')
+    assert response.status_code == 400
+    assert response.data['tags'] == [
+        'Теги не найдены: {}.'.format(', '.join(map(str, missing_ids)))]
@@ -0,0 +1,51 @@
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from api.renderers import FastJSONRenderer
+
+PAYLOADS = (
+    {'id': 1, 'name': 'Борщ', 'tags': [], 'image': None},
+    {'text': 'строка\u2028абзац \n\t"кавычки"\x01'},
+    {'pub_date': datetime(2026, 10, 18, 3, 40, 57, 123456, timezone.utc)},
+    {'coverage': [0.5, 0.3333, 1.0, -0.0, 0.0001]},
+    {'amount': Decimal('1.50'), 'big': 2 ** 70, 1: 'int key'},
+    [1, 'a', None, True, {'nested': [{}]}],
+)
+
+
+@pytest.mark.parametrize('data', PAYLOADS)
+def test_output_matches_json_renderer(data):
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_floats_keep_their_value():
+    data = {'large': [1e16, 1e20, -2.5e21], 'small': [1e-05, 1e-7]}
+    content = FastJSONRenderer().render(data)
+    assert content != JSONRenderer().render(data)
+    assert json.loads(content) == data
+
+
+@pytest.mark.parametrize('value', (
+    float('nan'), float('inf'), -float('inf'), Decimal('NaN')))
+def test_non_finite_numbers_are_rejected(value):
+    data = {'value': [None, {'nested': (1, value)}]}
+    with pytest.raises(ValueError):
+        JSONRenderer().render(data)
+    with pytest.raises(ValueError):
+        FastJSONRenderer().render(data)
+
+
+def test_non_finite_numbers_match_json_renderer_when_not_strict(
+        monkeypatch):
+    data = {'value': [float('nan'), -float('inf')]}
+    monkeypatch.setattr(JSONRenderer, 'strict', False)
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_recipe_list_matches_json_renderer(user_client):
+    response = user_client.get('/api/recipes/', {'limit': 10})
+    assert response.content == JSONRenderer().render(response.data)
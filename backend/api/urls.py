@@ -2,7 +2,7 @@ from django.urls import include, path
 from rest_framework import routers
 
 from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                    TagViewSet, upload_csv)
+                    TagViewSet, instrumentation_report, upload_csv)
 
 app_name = 'api'
 
@@ -18,4 +18,6 @@ urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
     path('upload_csv/', upload_csv, name='upload_csv'),
+    path('instrumentation/', instrumentation_report,
+         name='instrumentation'),
 ]
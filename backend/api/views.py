@@ -1,52 +1,139 @@
-from datetime import datetime
+import os
+from collections import defaultdict
+from itertools import chain
 
+from django.conf import settings
 from django.contrib import messages
-from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseRedirect
+from django.db.models import F, Value
+from django.http import Http404, HttpResponseRedirect, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render
 from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
-from api.filters import IngredientFilter, RecipeFilter
+from api.async_views import AsyncReadMixin
+from api.autocomplete import ingredient_index
+from api.batch import batch_results
+from api.cache import CachedResponseMixin
+from api.exporters import EXPORTERS, merge_ingredients
+from api.filters import RecipeFilter
+from api.importers import IMPORT_FORMATS, decode, import_ingredients
+from api.instrumentation import SerializationTimingMixin, get_report
+from api.matching import recipe_ingredient_index
 from api.pagination import LimitPageNumberPagination
 from api.permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from api.serializers import (CustomUserSerializer, FollowSerializer,
+from api.registry import tag_registry
+from api.relations import get_user_relations
+from api.serializers import (BatchSerializer, CartItemSerializer,
+                             CustomUserSerializer, FollowSerializer,
                              IngredientSerializer, RecipeReadSerializer,
                              RecipeShortSerializer, RecipeWriteSerializer,
-                             TagSerializer)
-from cookbook.models import (Favorite, Ingredient, IngredientAmount, Recipe,
-                             ShoppingCart, Tag)
+                             TagSerializer, get_recipes_limit)
+from api.sparse import is_selected
+from cookbook.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
 from users.models import Follow, User
 
+SHOPPING_LIST_CHUNK_SIZE = 2000
 
-class TagViewSet(ReadOnlyModelViewSet):
+
+def batch_response(request, model, excluded=()):
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(batch_results(
+        request, model, serializer.validated_data['ids'], excluded))
+
+
+class TagViewSet(AsyncReadMixin, ReadOnlyModelViewSet):
+    """Tags served from the tag registry without queries."""
     serializer_class = TagSerializer
     pagination_class = None
     queryset = Tag.objects.all()
 
+    def list(self, request, *args, **kwargs):
+        return Response(tag_registry.get().tags)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.tag_response(tag_registry.get())
+
+    async def alist(self, request, *args, **kwargs):
+        return Response((await tag_registry.aget()).tags)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return self.tag_response(await tag_registry.aget())
+
+    def tag_response(self, registry):
+        pk = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            tag = registry.by_id.get(int(pk))
+        except ValueError:
+            tag = None
+        if tag is None:
+            raise Http404('No Tag matches the given query.')
+        return Response(tag)
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+
+class IngredientViewSet(SerializationTimingMixin, AsyncReadMixin,
+                        ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (DjangoFilterBackend,)
     permission_classes = (IsAdminOrReadOnly,)
-    filterset_class = IngredientFilter
+    async_actions = ('list', )
+
+    def list(self, request, *args, **kwargs):
+        return self.ingredients_response(request, ingredient_index.get())
+
+    async def alist(self, request, *args, **kwargs):
+        return self.ingredients_response(
+            request, await ingredient_index.aget())
 
+    def ingredients_response(self, request, index):
+        name = request.query_params.get('name')
+        if name:
+            return Response(
+                index.search(name, settings.INGREDIENT_SEARCH_LIMIT))
+        return Response(index.all())
 
-class RecipeViewSet(ModelViewSet):
+
+class RecipeViewSet(SerializationTimingMixin, CachedResponseMixin,
+                    AsyncReadMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
     pagination_class = LimitPageNumberPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    cache_generation = 'recipes'
+    cache_query_params = (
+        'tags', 'author', 'page', 'limit', 'search', 'cursor', 'count',
+        'fields', 'omit')
+    keyset_ordering = ('-pub_date', '-id')
+    tags = None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.with_related(omit=[
+                name for name in queryset.optional_fields
+                if not is_selected(self.request, name)])
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.tags is not None:
+            context['tags'] = self.tags
+        return context
+
+    async def aprepare(self, request, objects):
+        await get_user_relations(request).apreload(
+            *RecipeReadSerializer.get_relation_names(request))
+        self.tags = await tag_registry.aget()
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -76,6 +163,24 @@ class RecipeViewSet(ModelViewSet):
             return self.add_to(ShoppingCart, request.user, pk)
         return self.delete_from(ShoppingCart, request.user, pk)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite',
+        permission_classes=[IsAuthenticated]
+    )
+    def favorite_batch(self, request):
+        return batch_response(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_batch(self, request):
+        return batch_response(request, ShoppingCart)
+
     def add_to(self, model, user, pk):
         if model.objects.filter(user=user, recipe__id=pk).exists():
             return Response({'errors': 'Рецепт уже был добавлен.'},
@@ -93,46 +198,91 @@ class RecipeViewSet(ModelViewSet):
         return Response({'errors': 'Ошибка при удалении рецепта.'},
                         status=HTTP_400_BAD_REQUEST)
 
+    @action(
+        detail=False,
+        url_path='by_ingredients',
+    )
+    def by_ingredients(self, request):
+        try:
+            ingredient_ids = [
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value.strip()]
+        except ValueError:
+            ingredient_ids = None
+        if not ingredient_ids:
+            return Response({'errors': 'Укажите id ингредиентов в параметре '
+                             'ingredients, например ?ingredients=1,2,3.'},
+                            status=HTTP_400_BAD_REQUEST)
+        matches = self.paginate_queryset(recipe_ingredient_index.get().match(
+            ingredient_ids))
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in matches])
+        data = []
+        for recipe_id, matched, missing in matches:
+            if recipe_id not in recipes:
+                continue
+            item = self.get_serializer(recipes[recipe_id]).data
+            item['coverage'] = round(matched / (matched + missing), 4)
+            item['missing_count'] = missing
+            data.append(item)
+        return self.get_paginated_response(data)
+
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'download_shopping_cart':
+            force = True
+        return super().perform_content_negotiation(request, force)
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated]
     )
     def download_shopping_cart(self, request):
-        user = request.user
-        if not user.carts.exists():
+        export_format = request.query_params.get('format', 'txt')
+        if export_format not in EXPORTERS:
+            return Response({'errors': 'Неподдерживаемый формат. '
+                             'Доступные форматы: '
+                             + ', '.join(EXPORTERS)},
+                            status=HTTP_400_BAD_REQUEST)
+
+        rows = request.user.cart_items.values(
+            'amount',
+            name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit'),
+        ).order_by('name', 'measurement_unit').iterator(
+            chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+        first_row = next(rows, None)
+        if first_row is None:
             return Response({'errors': 'Корзина пуста. '
                              'Пожалуйста, добавьте в неё рецепт.'},
                             status=HTTP_400_BAD_REQUEST)
 
-        ingredients = IngredientAmount.objects.filter(
-            recipe__in_carts__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        today = datetime.today()
-        shopping_list = (
-            f'Корзина пользователя: {user.username}\n\n'
-            f'Дата: {today:%Y-%m-%d}\n\n'
-        )
-        shopping_list += '\n'.join([
-            f'- {ingredient["ingredient__name"]} '
-            f' - {ingredient["amount"]}'
-            f'{ingredient["ingredient__measurement_unit"]}'
-            for ingredient in ingredients
-        ])
-
-        filename = f'{user.username}_shopping_list.txt'
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={filename}'
+        exporter = EXPORTERS[export_format](
+            request.user, merge_ingredients(chain((first_row,), rows)))
+        response = StreamingHttpResponse(
+            exporter, content_type=exporter.content_type)
+        response['Content-Disposition'] = (
+            f'attachment; filename={exporter.filename}')
         return response
 
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def shopping_cart_summary(self, request):
+        items = request.user.cart_items.select_related(
+            'ingredient').order_by(
+            'ingredient__name', 'ingredient__measurement_unit')
+        return Response(CartItemSerializer(items, many=True).data)
+
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(SerializationTimingMixin, AsyncReadMixin,
+                        UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = LimitPageNumberPagination
+    keyset_ordering = ('username', 'id')
+    async_actions = ('subscriptions', )
 
     @action(
         detail=True,
@@ -159,14 +309,47 @@ class CustomUserViewSet(UserViewSet):
             subscription.delete()
             return Response(status=HTTP_204_NO_CONTENT)
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='subscribe',
+        permission_classes=[IsAuthenticated]
+    )
+    def subscribe_batch(self, request):
+        return batch_response(request, Follow, excluded=(request.user.id, ))
+
     @action(
         detail=False,
         permission_classes=[IsAuthenticated]
     )
     def subscriptions(self, request):
-        user = request.user
-        queryset = User.objects.filter(following__user=user)
-        pages = self.paginate_queryset(queryset)
+        pages = self.paginate_queryset(self.get_subscriptions(request))
+        return self.subscriptions_response(request, pages, list(
+            self.get_recent_recipes(request, pages)))
+
+    async def asubscriptions(self, request):
+        pages = await self.apaginate_queryset(
+            self.get_subscriptions(request))
+        return self.subscriptions_response(request, pages, [
+            recipe async for recipe in self.get_recent_recipes(
+                request, pages)])
+
+    def get_subscriptions(self, request):
+        return User.objects.filter(following__user=request.user).annotate(
+            is_subscribed=Value(True))
+
+    def get_recent_recipes(self, request, authors):
+        if not is_selected(request, 'recipes'):
+            return Recipe.objects.none()
+        return Recipe.objects.filter(author__in=authors).latest_by_author(
+            get_recipes_limit(request))
+
+    def subscriptions_response(self, request, pages, recent_recipes):
+        recipes = defaultdict(list)
+        for recipe in recent_recipes:
+            recipes[recipe.author_id].append(recipe)
+        for author in pages:
+            author.recent_recipes = recipes[author.id]
         serializer = FollowSerializer(pages,
                                       many=True,
                                       context={'request': request})
@@ -177,29 +360,22 @@ def upload_csv(request):
     data = {}
     if "GET" == request.method:
         return render(request, 'api/upload.html', data)
+    csv_file = request.FILES.get('csv_file')
+    file_format = os.path.splitext(
+        csv_file.name if csv_file else '')[1].lstrip('.').lower()
+    if file_format not in IMPORT_FORMATS:
+        messages.error(request, 'Пожалуйста, загрузите CSV- или JSON-файл')
+        return HttpResponseRedirect(reverse('api:upload_csv'))
     try:
-        csv_file = request.FILES['csv_file']
-        if not csv_file.name.endswith('.csv'):
-            messages.error(request, 'Пожалуйста, загрузите CSV-файл')
-            return HttpResponseRedirect(reverse('api:upload_csv'))
-        if csv_file.multiple_chunks():
-            messages.error(request,
-                           'Слишком большой файл (%.2f MB).'
-                           % (csv_file.size / (1000 * 1000),))
-            return HttpResponseRedirect(reverse('api:upload_csv'))
-        file_data = csv_file.read().decode("utf-8")
-        lines = file_data.split('\n')
-        for line in lines:
-            fields = line.split(",")
-            try:
-                ingredient = Ingredient(
-                    name=fields[0],
-                    measurement_unit=fields[1], )
-                ingredient.save()
-            except Exception as e:
-                messages.error(request, 'Невозможно загрузить файл: '
-                               + repr(e))
-                pass
-    except Exception as e:
+        report = import_ingredients(decode(csv_file), file_format)
+    except ValueError as e:
         messages.error(request, 'Невозможно загрузить файл: ' + repr(e))
+    else:
+        messages.success(request, str(report))
     return HttpResponseRedirect(reverse("api:upload_csv"))
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def instrumentation_report(request):
+    return Response(get_report())
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+DEFAULT_USERS = 50
+DEFAULT_RECIPES = 200
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+BENCHMARK_RESULTS = pytest.StashKey[dict]()
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('foodgram')
+    group.addoption(
+        '--seed-users', type=int, default=DEFAULT_USERS,
+        help='Количество пользователей в тестовой базе.')
+    group.addoption(
+        '--seed-recipes', type=int, default=DEFAULT_RECIPES,
+        help='Количество рецептов в тестовой базе.')
+    group.addoption(
+        '--benchmark-repeat', type=int, default=DEFAULT_REPEAT,
+        help='Количество повторов каждого сценария замеров.')
+    group.addoption(
+        '--benchmark-output',
+        help='Сохранить результаты замеров в JSON-файл.')
+    group.addoption(
+        '--benchmark-baseline',
+        help='Сравнить результаты замеров с ранее сохранённым '
+             'JSON-файлом.')
+    group.addoption(
+        '--benchmark-tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help='Допустимый относительный рост времени ответа '
+             'по сравнению с базовым замером.')
+
+
+def pytest_configure(config):
+    config.stash[BENCHMARK_RESULTS] = {}
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    results = config.stash[BENCHMARK_RESULTS]
+    if not results:
+        return
+    terminalreporter.section('замеры')
+    terminalreporter.write_line(f'{"сценарий":<24}{"мс":>10}{"запросы":>10}'
+                                f'{"память, КиБ":>14}')
+    for name, result in results.items():
+        terminalreporter.write_line(
+            f'{name:<24}{result["ms"]:>10}{result["queries"]:>10}'
+            f'{result["peak_kib"]:>14}')
+
+
+def pytest_sessionfinish(session):
+    results = session.config.stash[BENCHMARK_RESULTS]
+    output = session.config.getoption('benchmark_output')
+    if output and results:
+        with open(output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+
+@pytest.fixture
+def benchmark_results(pytestconfig):
+    """Results of the benchmark scenarios, keyed by scenario name."""
+    return pytestconfig.stash[BENCHMARK_RESULTS]
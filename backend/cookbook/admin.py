@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.admin import display
 
-from .models import (Favorite, Ingredient, IngredientAmount, Recipe,
+from .models import (CartItem, Favorite, Ingredient, IngredientAmount, Recipe,
                      ShoppingCart, Tag)
 
 
@@ -20,7 +20,7 @@ class RecipeAdmin(admin.ModelAdmin):
 
     @display(description='Избранных рецептов:')
     def added_in_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
 
 @admin.register(Ingredient)
@@ -47,3 +47,8 @@ class FavouriteAdmin(admin.ModelAdmin):
 @admin.register(IngredientAmount)
 class IngredientInRecipe(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount',)
+
+
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount',)
@@ -0,0 +1,151 @@
+from collections import Counter
+
+from django.db import connection
+
+from cookbook.models import CartItem, IngredientAmount, ShoppingCart
+
+BATCH_SIZE = 1000
+TABLES = {
+    'items': CartItem._meta.db_table,
+    'carts': ShoppingCart._meta.db_table,
+    'amounts': IngredientAmount._meta.db_table,
+}
+# Postgres and SQLite both support INSERT ... ON CONFLICT.
+ADD_AMOUNTS = """
+    INSERT INTO {items} (user_id, ingredient_id, amount) %s
+    ON CONFLICT (user_id, ingredient_id)
+    DO UPDATE SET amount = {items}.amount + excluded.amount
+"""
+# Ingredient rows of the selected cart recipes, joined to the cart owners.
+SELECTED_ROWS = """
+    FROM {carts} AS cart
+    JOIN {amounts} AS recipe_amount
+        ON recipe_amount.recipe_id = cart.recipe_id
+    WHERE {where}
+"""
+UPSERT = ADD_AMOUNTS % ("""
+    SELECT cart.user_id, recipe_amount.ingredient_id,
+        %s * SUM(recipe_amount.amount)
+""" + SELECTED_ROWS + """
+    GROUP BY cart.user_id, recipe_amount.ingredient_id
+""")
+DELETE_EMPTY = """
+    DELETE FROM {items} WHERE amount <= 0 AND user_id IN (
+        SELECT cart.user_id """ + SELECTED_ROWS + ')'
+RECIPE_UPSERT = ADD_AMOUNTS % """
+    SELECT cart.user_id, %s, %s FROM {carts} AS cart
+    WHERE cart.recipe_id = %s
+"""
+USER_UPSERT = ADD_AMOUNTS % """
+    SELECT %s, ingredient_id, %s * SUM(amount) FROM {amounts}
+    WHERE recipe_id IN ({recipes})
+    GROUP BY ingredient_id
+"""
+USER_DELETE_EMPTY = 'DELETE FROM {items} WHERE user_id = %s AND amount <= 0'
+RECIPE_DELETE_EMPTY = """
+    DELETE FROM {items} WHERE amount <= 0 AND ingredient_id IN ({ingredients})
+        AND user_id IN (SELECT user_id FROM {carts} WHERE recipe_id = %s)
+"""
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def change_cart_items(sign, where, params):
+    """Add (sign 1) or subtract (sign -1) the selected ingredient rows.
+
+    Must run while the rows still exist, so subtracting happens before
+    they are deleted or changed. Items left without an amount are
+    deleted.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            UPSERT.format(where=where, **TABLES), [sign, *params])
+        if sign < 0:
+            cursor.execute(
+                DELETE_EMPTY.format(where=where, **TABLES), params)
+
+
+def change_carts(sign, cart_ids):
+    """Add or subtract the recipes of the carts to their owners' items."""
+    cart_ids = list(cart_ids)
+    if cart_ids:
+        change_cart_items(
+            sign, f'cart.id IN ({placeholders(cart_ids)})', cart_ids)
+
+
+def change_amounts(sign, amount_ids):
+    """Add or subtract ingredient rows in every cart holding the recipe."""
+    amount_ids = list(amount_ids)
+    if amount_ids:
+        change_cart_items(
+            sign, f'recipe_amount.id IN ({placeholders(amount_ids)})',
+            amount_ids)
+
+
+def change_recipe_amounts(recipe_id, deltas):
+    """Change the amounts of ingredients in every cart holding the recipe.
+
+    deltas maps ingredient ids to the change of their amount in the
+    recipe, so rows changed in bulk cost one statement.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(RECIPE_UPSERT.format(**TABLES), [
+            (ingredient_id, delta, recipe_id)
+            for ingredient_id, delta in deltas.items()])
+        reduced = [pk for pk, delta in deltas.items() if delta < 0]
+        if reduced:
+            cursor.execute(RECIPE_DELETE_EMPTY.format(
+                ingredients=placeholders(reduced), **TABLES),
+                [*reduced, recipe_id])
+
+
+def change_user_recipes(sign, user_id, recipe_ids):
+    """Add or subtract whole recipes in the cart items of one user.
+
+    Reads only the ingredient rows, so it also works after the cart
+    rows have been deleted.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(USER_UPSERT.format(
+            recipes=placeholders(recipe_ids), **TABLES),
+            [user_id, sign, *recipe_ids])
+        if sign < 0:
+            cursor.execute(USER_DELETE_EMPTY.format(**TABLES), [user_id])
+
+
+def reconcile():
+    """Recalculate every cart item and return the number of fixed rows."""
+    expected = Counter()
+    for row in ShoppingCart.objects.values_list(
+            'user', 'recipe__ingredient_list__ingredient',
+            'recipe__ingredient_list__amount').iterator():
+        user_id, ingredient_id, amount = row
+        if ingredient_id is not None:
+            expected[user_id, ingredient_id] += amount
+    items = {(item.user_id, item.ingredient_id): item
+             for item in CartItem.objects.all()}
+    deleted = [item.id for key, item in items.items()
+               if key not in expected]
+    created = [CartItem(user_id=user_id, ingredient_id=ingredient_id,
+                        amount=amount)
+               for (user_id, ingredient_id), amount in expected.items()
+               if (user_id, ingredient_id) not in items]
+    updated = []
+    for key, item in items.items():
+        if key in expected and item.amount != expected[key]:
+            item.amount = expected[key]
+            updated.append(item)
+    CartItem.objects.filter(id__in=deleted).delete()
+    CartItem.objects.bulk_create(created, batch_size=BATCH_SIZE)
+    CartItem.objects.bulk_update(
+        updated, ('amount', ), batch_size=BATCH_SIZE)
+    return {'created': len(created), 'updated': len(updated),
+            'deleted': len(deleted)}
@@ -0,0 +1,41 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from cookbook.models import Favorite, Recipe
+from users.models import Follow, User
+
+
+def increment(queryset, field, delta):
+    """Atomically change a counter field of the queryset rows.
+
+    A decrement never takes a counter below zero, drifted counters are
+    left to the recount command.
+    """
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def count_of(queryset, field):
+    """Subquery counting the queryset rows related to the outer row."""
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')), Value(0))
+
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite.objects.all(), 'recipe'),
+    (User, 'recipes_count', Recipe.objects.all(), 'author'),
+    (User, 'followers_count', Follow.objects.all(), 'author'),
+)
+
+
+def recount():
+    """Recalculate every counter and return the number of fixed rows."""
+    fixed = {}
+    for model, field, related, related_field in COUNTERS:
+        actual = count_of(related, related_field)
+        fixed[f'{model._meta.label}.{field}'] = model.objects.alias(
+            actual=actual).exclude(**{field: F('actual')}).update(
+            **{field: actual})
+    return fixed
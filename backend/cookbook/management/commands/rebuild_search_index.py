@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cookbook.models import Recipe
+from cookbook.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает поисковый индекс рецептов, например после '
+            'загрузки данных в обход сигналов.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            update_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {Recipe.objects.count()}.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cookbook.carts import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает суммы ингредиентов в корзинах пользователей '
+            'и исправляет расхождения.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = reconcile()
+        self.stdout.write(
+            f'Добавлено записей: {fixed["created"]}, исправлено: '
+            f'{fixed["updated"]}, удалено: {fixed["deleted"]}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cookbook.counters import recount
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики избранного, рецептов и подписчиков '
+            'и исправляет расхождения.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            fixed = recount()
+        for counter, rows in fixed.items():
+            self.stdout.write(f'{counter}: исправлено записей: {rows}')
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:56
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    """Keep the oldest of the ingredients sharing a name and a unit.
+
+    Amounts of the duplicates move to the kept ingredient. A recipe
+    already using it gets the amounts added up, as a recipe may use an
+    ingredient only once.
+    """
+    Ingredient = apps.get_model('cookbook', 'Ingredient')
+    IngredientAmount = apps.get_model('cookbook', 'IngredientAmount')
+    groups = Ingredient.objects.values('name', 'measurement_unit').annotate(
+        count=Count('id'), kept_id=Min('id')).filter(count__gt=1)
+    for group in groups:
+        duplicates = Ingredient.objects.filter(
+            name=group['name'],
+            measurement_unit=group['measurement_unit'],
+        ).exclude(id=group['kept_id'])
+        kept = {
+            amount.recipe_id: amount
+            for amount in IngredientAmount.objects.filter(
+                ingredient_id=group['kept_id'])}
+        for amount in IngredientAmount.objects.filter(
+                ingredient__in=duplicates).order_by('id'):
+            if amount.recipe_id in kept:
+                kept[amount.recipe_id].amount += amount.amount
+                kept[amount.recipe_id].save(update_fields=['amount'])
+                amount.delete()
+            else:
+                amount.ingredient_id = group['kept_id']
+                amount.save(update_fields=['ingredient'])
+                kept[amount.recipe_id] = amount
+        duplicates.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0004_alter_shoppingcart_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
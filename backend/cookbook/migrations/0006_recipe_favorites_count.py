@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:01
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_of(queryset, field):
+    return Coalesce(Subquery(
+        queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(count=Count('pk')).values('count')), Value(0))
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('cookbook', 'Recipe')
+    Favorite = apps.get_model('cookbook', 'Favorite')
+    User = apps.get_model('users', 'User')
+    Follow = apps.get_model('users', 'Follow')
+    Recipe.objects.update(
+        favorites_count=count_of(Favorite.objects.all(), 'recipe'))
+    User.objects.update(
+        recipes_count=count_of(Recipe.objects.all(), 'author'),
+        followers_count=count_of(Follow.objects.all(), 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0005_ingredient_unique_ingredient'),
+        ('users', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавлений в избранное'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0006_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Варианты изображения'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:12
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_INDEX = django.contrib.postgres.indexes.GinIndex(
+    fields=['search_vector'], name='recipe_search_vector')
+
+POSTGRES_FILL = """
+    UPDATE cookbook_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('russian', recipe.name), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM cookbook_ingredientamount AS amount
+            JOIN cookbook_ingredient AS ingredient
+                ON ingredient.id = amount.ingredient_id
+            WHERE amount.recipe_id = recipe.id), '')), 'B')
+        || setweight(to_tsvector('russian', recipe.text), 'C')
+"""
+SQLITE_CREATE = """
+    CREATE VIRTUAL TABLE cookbook_recipe_fts USING fts5(
+        name, ingredients, text, tokenize = 'unicode61 remove_diacritics 2')
+"""
+SQLITE_FILL = """
+    INSERT INTO cookbook_recipe_fts (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM cookbook_ingredientamount AS amount
+        JOIN cookbook_ingredient AS ingredient
+            ON ingredient.id = amount.ingredient_id
+        WHERE amount.recipe_id = recipe.id), ''), recipe.text
+    FROM cookbook_recipe AS recipe
+"""
+
+
+def create_search_index(apps, schema_editor):
+    """Index the stored tsvector on Postgres, or add an FTS5 table."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.add_index(
+            apps.get_model('cookbook', 'Recipe'), SEARCH_INDEX)
+        schema_editor.execute(POSTGRES_FILL)
+    elif vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_FILL)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.remove_index(
+            apps.get_model('cookbook', 'Recipe'), SEARCH_INDEX)
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE cookbook_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0007_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='recipe',
+                    index=SEARCH_INDEX,
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_search_index, drop_search_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:18
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+NAME_PREFIX_INDEX = models.Index(
+    django.contrib.postgres.indexes.OpClass(
+        django.db.models.functions.text.Upper('name'),
+        name='text_pattern_ops'),
+    name='ingredient_name_prefix')
+
+
+def create_name_prefix_index(apps, schema_editor):
+    """Operator classes only exist on Postgres.
+
+    The index is left out of the model state, SQLite could not rebuild
+    the table with it.
+    """
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(
+            apps.get_model('cookbook', 'Ingredient'), NAME_PREFIX_INDEX)
+
+
+def drop_name_prefix_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(
+            apps.get_model('cookbook', 'Ingredient'), NAME_PREFIX_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0009_recipe_pub_date_id'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='favorite',
+            index=models.Index(fields=['user', 'recipe'], name='favorite_user_recipe'),
+        ),
+        migrations.RunPython(
+            create_name_prefix_index, drop_name_prefix_index),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_id'),
+        ),
+        migrations.AddIndex(
+            model_name='shoppingcart',
+            index=models.Index(fields=['recipe', 'user'], name='shoppingcart_recipe_user'),
+        ),
+    ]
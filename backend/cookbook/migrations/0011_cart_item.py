@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:34
+
+from collections import Counter
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_cart_items(apps, schema_editor):
+    ShoppingCart = apps.get_model('cookbook', 'ShoppingCart')
+    CartItem = apps.get_model('cookbook', 'CartItem')
+    totals = Counter()
+    for user_id, ingredient_id, amount in ShoppingCart.objects.values_list(
+            'user', 'recipe__ingredient_list__ingredient',
+            'recipe__ingredient_list__amount').iterator():
+        if ingredient_id is not None:
+            totals[user_id, ingredient_id] += amount
+    CartItem.objects.bulk_create(
+        (CartItem(user_id=user_id, ingredient_id=ingredient_id,
+                  amount=amount)
+         for (user_id, ingredient_id), amount in totals.items()),
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cookbook', '0010_reverse_lookup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.IntegerField(default=0, verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to='cookbook.ingredient', verbose_name='Ингридиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_items', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'ингридиент корзины',
+                'verbose_name_plural': 'ингридиенты корзины',
+                'constraints': [models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_cart_item')],
+            },
+        ),
+        migrations.RunPython(fill_cart_items, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,11 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core import validators
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import F, OuterRef, Prefetch, Subquery, Window
+from django.db.models.functions import RowNumber
 
 from users.models import User
 
@@ -57,11 +61,74 @@ class Ingredient(models.Model):
         verbose_name = 'ингридиент'
         verbose_name_plural = 'ингридиенты'
         ordering = ('name', )
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'), )
+        # The ingredient_name_prefix index for istartswith is created on
+        # Postgres only, by a migration. It stays out of the model state
+        # so SQLite can rebuild the table.
 
     def __str__(self):
         return f'{self.name}'
 
 
+class GroupConcat(models.Aggregate):
+    """Values of a column joined with commas."""
+    function = 'GROUP_CONCAT'
+    output_field = models.TextField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, function='STRING_AGG',
+            template="%(function)s(%(expressions)s::text, ',')",
+            **extra_context)
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Recipe queryset with helpers for the API read path."""
+    # Fields whose data with_related can skip.
+    optional_fields = ('author', 'tags', 'ingredients', 'text')
+
+    def with_related(self, omit=()):
+        """Join the author, prefetch ingredient amounts and annotate
+        tag_ids, the comma separated ids of the tags.
+
+        Tags themselves come from the in-memory tag registry. The search
+        vector is only used in filters and is not loaded, nor is anything
+        needed only by the optional_fields listed in omit.
+        """
+        queryset = self.defer('search_vector', *(
+            name for name in omit if name == 'text'))
+        if 'author' not in omit:
+            queryset = queryset.select_related('author')
+        if 'tags' not in omit:
+            queryset = queryset.annotate(tag_ids=Subquery(
+                self.model.tags.through.objects.filter(
+                    recipe=OuterRef('pk')).values('recipe').annotate(
+                    ids=GroupConcat('tag')).values('ids')))
+        if 'ingredients' in omit:
+            return queryset
+        return queryset.prefetch_related(Prefetch(
+            'ingredient_list',
+            queryset=IngredientAmount.objects.select_related(
+                'ingredient'), ), )
+
+    def latest_by_author(self, limit=None):
+        """Keep only the newest recipes of every author, up to the limit.
+
+        Recipes are numbered per author with ROW_NUMBER, so the recipes of
+        a whole page of authors are fetched in a single query.
+        """
+        queryset = self.annotate(author_position=Window(
+            RowNumber(),
+            partition_by=F('author'),
+            order_by=(F('pub_date').desc(), F('id').desc()), ))
+        if limit is None:
+            return queryset
+        return queryset.filter(author_position__lte=limit)
+
+
 class Recipe(models.Model):
     """Recipe model."""
     author = models.ForeignKey(
@@ -101,6 +168,21 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True,
         editable=False, )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False, )
+    image_variants = models.JSONField(
+        verbose_name='Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False, )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False, )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'рецепт',
@@ -109,6 +191,14 @@ class Recipe(models.Model):
             models.CheckConstraint(
                 check=models.Q(cooking_time__gte=1),
                 name='recipe_cooking_time_range'), )
+        indexes = (
+            GinIndex(fields=('search_vector',), name='recipe_search_vector'),
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_id'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_id'),
+        )
         ordering = ('-pub_date',)
 
     def __str__(self):
@@ -176,6 +266,9 @@ class Favorite(models.Model):
                 name='unique_user_recipe',
             ),
         )
+        indexes = (
+            models.Index(
+                fields=('user', 'recipe'), name='favorite_user_recipe'), )
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
@@ -200,6 +293,40 @@ class ShoppingCart(models.Model):
                 fields=['user', 'recipe'],
                 name='unique_shopping_chart', )
         ]
+        indexes = (
+            models.Index(
+                fields=('recipe', 'user'), name='shoppingcart_recipe_user'), )
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class CartItem(models.Model):
+    """Total amount of an ingredient over the recipes in a user's cart.
+
+    Kept up to date by the shopping cart and ingredient amount signals,
+    so the shopping list is read without summing the recipes.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Пользователь', )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name='Ингридиент', )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+        default=0, )
+
+    class Meta:
+        verbose_name = 'ингридиент корзины'
+        verbose_name_plural = 'ингридиенты корзины'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'), name='unique_cart_item'), )
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.amount}'
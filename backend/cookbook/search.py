@@ -0,0 +1,102 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+
+from cookbook.models import Recipe
+
+CONFIG = 'russian'
+FTS_TABLE = 'cookbook_recipe_fts'
+TERM = re.compile(r'\w+')
+
+# Names weigh the most, then ingredients, then the description.
+POSTGRES_UPDATE = f"""
+    UPDATE cookbook_recipe AS recipe SET search_vector =
+        setweight(to_tsvector('{CONFIG}', recipe.name), 'A')
+        || setweight(to_tsvector('{CONFIG}', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM cookbook_ingredientamount AS amount
+            JOIN cookbook_ingredient AS ingredient
+                ON ingredient.id = amount.ingredient_id
+            WHERE amount.recipe_id = recipe.id), '')), 'B')
+        || setweight(to_tsvector('{CONFIG}', recipe.text), 'C')
+"""
+SQLITE_DELETE = f'DELETE FROM {FTS_TABLE}'
+SQLITE_INSERT = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text)
+    SELECT recipe.id, recipe.name, coalesce((
+        SELECT group_concat(ingredient.name, ' ')
+        FROM cookbook_ingredientamount AS amount
+        JOIN cookbook_ingredient AS ingredient
+            ON ingredient.id = amount.ingredient_id
+        WHERE amount.recipe_id = recipe.id), ''), recipe.text
+    FROM cookbook_recipe AS recipe
+"""
+SQLITE_WEIGHTS = '10.0, 5.0, 1.0'
+
+
+def where_ids(column, ids):
+    return f' WHERE {column} IN ({", ".join(["%s"] * len(ids))})'
+
+
+def update_search_index(recipe_ids=None):
+    """Rebuild the search documents of the recipes, or of all recipes.
+
+    Postgres keeps a weighted tsvector in Recipe.search_vector, SQLite
+    keeps the same columns in an FTS5 table. Other databases have no
+    index and search falls back to icontains.
+    """
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            sql = POSTGRES_UPDATE
+            if recipe_ids is not None:
+                sql += where_ids('recipe.id', recipe_ids)
+            cursor.execute(sql, recipe_ids)
+        elif connection.vendor == 'sqlite':
+            delete, insert = SQLITE_DELETE, SQLITE_INSERT
+            if recipe_ids is not None:
+                delete += where_ids('rowid', recipe_ids)
+                insert += where_ids('recipe.id', recipe_ids)
+            cursor.execute(delete, recipe_ids)
+            cursor.execute(insert, recipe_ids)
+
+
+def delete_from_search_index(recipe_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(SQLITE_DELETE + where_ids('rowid', [recipe_id]),
+                           [recipe_id])
+
+
+def search_recipes(queryset, query):
+    """Filter recipes matching the query and order them by relevance.
+
+    Matching recipes get a search_rank annotation, higher is better.
+    """
+    terms = TERM.findall(query.lower())
+    if not terms:
+        return queryset
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, config=CONFIG, search_type='websearch')
+        queryset = queryset.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank('search_vector', search_query))
+    elif connection.vendor == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # The FTS5 table is joined in, bm25() only works within the
+        # query running the MATCH.
+        queryset = queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {Recipe._meta.db_table}.id',
+                   f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-bm25({FTS_TABLE}, {SQLITE_WEIGHTS})'})
+    else:
+        for term in terms:
+            queryset = queryset.filter(name__icontains=term)
+        return queryset
+    return queryset.order_by('-search_rank', '-pub_date', '-id')
@@ -0,0 +1,114 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from cookbook.carts import change_amounts, change_carts
+from cookbook.counters import increment
+from cookbook.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                             ShoppingCart)
+from cookbook.search import delete_from_search_index, update_search_index
+from users.models import Follow, User
+
+SEARCH_FIELDS = {'name', 'text'}
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_created(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(Recipe.objects.filter(pk=instance.recipe_id),
+                  'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favorite)
+def favorite_deleted(instance, **kwargs):
+    increment(Recipe.objects.filter(pk=instance.recipe_id),
+              'favorites_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(User.objects.filter(pk=instance.author_id),
+                  'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    increment(User.objects.filter(pk=instance.author_id),
+              'recipes_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        increment(User.objects.filter(pk=instance.author_id),
+                  'followers_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(instance, **kwargs):
+    increment(User.objects.filter(pk=instance.author_id),
+              'followers_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_saved(instance, raw=False, update_fields=None, **kwargs):
+    if raw or update_fields and not SEARCH_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(partial(update_search_index, [instance.pk]))
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_search_deleted(instance, **kwargs):
+    delete_from_search_index(instance.pk)
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def ingredient_amount_search_changed(instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(
+            partial(update_search_index, [instance.recipe_id]))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_search_saved(instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    transaction.on_commit(partial(
+        update_search_index, IngredientAmount.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True)))
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_created(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_carts(1, [instance.pk])
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def cart_deleted(instance, **kwargs):
+    change_carts(-1, [instance.pk])
+
+
+@receiver(pre_save, sender=IngredientAmount)
+def ingredient_amount_cart_saving(instance, raw=False, **kwargs):
+    if instance.pk and not raw:
+        change_amounts(-1, [instance.pk])
+
+
+@receiver(post_save, sender=IngredientAmount)
+def ingredient_amount_cart_saved(instance, raw=False, **kwargs):
+    if not raw:
+        change_amounts(1, [instance.pk])
+
+
+@receiver(pre_delete, sender=IngredientAmount)
+def ingredient_amount_cart_deleted(instance, origin=None, **kwargs):
+    # Deleted recipes leave carts through their cart rows and deleted
+    # ingredients cascade to cart items. Bulk deletes, like the one of
+    # the recipe serializer, update the carts themselves.
+    if origin is instance:
+        change_amounts(-1, [instance.pk])
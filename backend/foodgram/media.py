@@ -0,0 +1,106 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.cache import patch_cache_control
+from django.utils.encoding import iri_to_uri
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Content hashes of uploaded images and of ManifestStaticFilesStorage.
+HASHED_NAME = re.compile(r'[0-9a-f]{12,}')
+
+
+def parse_range(header, size):
+    """Return (start, end) of a single byte range, both inclusive.
+
+    Returns None when the whole file should be sent: no header, several
+    ranges or a malformed one. An unsatisfiable range gives start > end.
+    """
+    match = RANGE.match(header or '')
+    if match is None or match.groups() == ('', ''):
+        return None
+    start, end = match.groups()
+    if not start:
+        return max(size - int(end), 0), size - 1
+    return int(start), min(int(end), size - 1) if end else size - 1
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def stream(request, full_path, stat):
+    """Send the file from the worker, honouring a single Range request."""
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if byte_range is None or if_range and if_range != http_date(
+            stat.st_mtime):
+        response = FileResponse(open(full_path, 'rb'))
+    elif byte_range[0] > byte_range[1]:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            read_range(full_path, start, end - start + 1), status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, path, document_root, url):
+    """Serve a media or static file according to MEDIA_DELIVERY.
+
+    With "accel" nginx sends the file from the internal location named
+    in X-Accel-Redirect, with "sendfile" the front server reads the
+    path from X-Sendfile. Otherwise the file is streamed by the worker.
+    Content-hashed names are cached as immutable.
+    """
+    try:
+        full_path = safe_join(document_root, path)
+        stat = os.stat(full_path)
+    except (ValueError, OSError):
+        raise Http404('Файл не найден.')
+    if not os.path.isfile(full_path):
+        raise Http404('Файл не найден.')
+    if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'), stat.st_mtime):
+        return HttpResponseNotModified()
+    if settings.MEDIA_DELIVERY == 'accel':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = iri_to_uri(
+            f'{settings.MEDIA_ACCEL_PREFIX}{url}{path}')
+    elif settings.MEDIA_DELIVERY == 'sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = full_path
+    else:
+        response = stream(request, full_path, stat)
+    content_type, encoding = mimetypes.guess_type(full_path)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if HASHED_NAME.search(os.path.basename(path)):
+        patch_cache_control(
+            response, public=True, max_age=IMMUTABLE_MAX_AGE,
+            immutable=True)
+    else:
+        patch_cache_control(
+            response, public=True, max_age=settings.MEDIA_CACHE_MAX_AGE)
+    return response
@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     'cookbook', ]
 
 MIDDLEWARE = [
+    'api.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,6 +76,24 @@ DATABASES = {
         'PORT': (env.get('DB_PORT') or os.getenv('DB_PORT')), }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': (
+            env.get('CACHE_BACKEND') or os.getenv('CACHE_BACKEND')
+            or 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': (
+            env.get('CACHE_LOCATION') or os.getenv('CACHE_LOCATION')
+            or '/var/tmp/foodgram_cache'), },
+    # Resolved API tokens, kept in the memory of every worker.
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 10000}, },
+}
+
+API_CACHE_TIMEOUT = 60 * 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -104,6 +123,31 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static/')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Content-hashed static names need the manifest written by
+# collectstatic, without it every page using {% static %} fails.
+STATIC_MANIFEST = (
+    env.get('STATIC_MANIFEST') or os.getenv('STATIC_MANIFEST')
+    or '').lower() in ('1', 'true', 'yes')
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': (
+            'django.contrib.staticfiles.storage.ManifestStaticFilesStorage'
+            if STATIC_MANIFEST else
+            'django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
+
+# accel - X-Accel-Redirect for nginx, sendfile - X-Sendfile,
+# stream - the file is sent by the application itself.
+MEDIA_DELIVERY = (env.get('MEDIA_DELIVERY') or os.getenv('MEDIA_DELIVERY')
+                  or 'stream')
+MEDIA_ACCEL_PREFIX = '/protected'
+MEDIA_CACHE_MAX_AGE = 24 * 60 * 60
+
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
@@ -111,7 +155,11 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -136,3 +184,26 @@ DJOSER = {
 }
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
+
+SHOPPING_LIST_PDF_FONT = (
+    env.get('SHOPPING_LIST_PDF_FONT') or os.getenv('SHOPPING_LIST_PDF_FONT')
+    or '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
+SHOPPING_LIST_PDF_SPOOL_SIZE = 1024 * 1024
+
+INGREDIENT_SEARCH_LIMIT = 30
+
+# asgi serves the hot read endpoints with async views, see gunicorn.conf.py.
+SERVER_MODE = (
+    env.get('SERVER_MODE') or os.getenv('SERVER_MODE') or 'wsgi').lower()
+ASYNC_VIEWS = SERVER_MODE == 'asgi'
+
+IMAGE_WORKERS = int(env.get('IMAGE_WORKERS') or os.getenv('IMAGE_WORKERS') or 2)
+
+QUERY_INSTRUMENTATION = (
+    env.get('QUERY_INSTRUMENTATION') or os.getenv('QUERY_INSTRUMENTATION')
+    or '').lower() in ('1', 'true', 'yes')
+QUERY_BUDGET = int(env.get('QUERY_BUDGET') or os.getenv('QUERY_BUDGET') or 20)
+QUERY_REPEAT_THRESHOLD = 3
+QUERY_INSTRUMENTATION_SAMPLES = 1000
+# Seconds between copies of the samples of a worker to the shared cache.
+QUERY_INSTRUMENTATION_PUBLISH = 5
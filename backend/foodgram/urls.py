@@ -1,22 +1,20 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import include, path
-from django.views.static import serve
+from django.urls import include, path, re_path
+
+from foodgram.media import serve
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-    path(
-        r'media/(?P<path>.*)',
+    re_path(
+        r'^media/(?P<path>.+)$',
         serve,
-        {'document_root': settings.MEDIA_ROOT}, ),
-    path(
-        r'static/(?P<path>.*)',
+        {'document_root': settings.MEDIA_ROOT,
+         'url': settings.MEDIA_URL}, ),
+    re_path(
+        r'^static/(?P<path>.+)$',
         serve,
-        {'document_root': settings.STATIC_ROOT}, ),
+        {'document_root': settings.STATIC_ROOT,
+         'url': settings.STATIC_URL}, ),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL,
-                          document_root=settings.MEDIA_ROOT, )
@@ -0,0 +1,21 @@
+import multiprocessing
+import os
+
+from dotenv import dotenv_values
+
+env = dict(dotenv_values(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../infra/.env')))
+
+SERVER_MODE = (
+    env.get('SERVER_MODE') or os.getenv('SERVER_MODE') or 'wsgi').lower()
+
+bind = '0:8000'
+workers = int(env.get('GUNICORN_WORKERS') or os.getenv('GUNICORN_WORKERS')
+              or multiprocessing.cpu_count() * 2 + 1)
+
+if SERVER_MODE == 'asgi':
+    # Slow clients wait on the event loop instead of holding a worker.
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
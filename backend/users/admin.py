@@ -19,11 +19,11 @@ class UserAdmin(admin.ModelAdmin):
 
     @admin.display(description='Количество подписчиков')
     def count_followers(self, obj):
-        return obj.follower.count()
+        return obj.followers_count
 
     @admin.display(description='Количество рецептов')
     def count_recipes(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_count
 
 
 @admin.register(Follow)
@@ -22,6 +22,14 @@ class User(AbstractUser):
             'unique': 'Пользователь с такой почтой уже существует.',
         },
         help_text=LIMIT_NOTIFICATION, )
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False, )
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False, )
 
     class Meta:
         ordering = ('username',)
@@ -67,6 +75,9 @@ class Follow(models.Model):
                 name='no_self_follow'
             )
         ]
+        indexes = (
+            models.Index(fields=('author', 'user'), name='follow_author_user'),
+        )
 
     def __str__(self):
         return f'Пользователь {self.user} подписан на {self.author}'